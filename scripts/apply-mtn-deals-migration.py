@@ -1,87 +1,68 @@
 #!/usr/bin/env python3
 """
-Apply MTN Business Deals migration to Supabase
+Apply the MTN Business Deals migrations to Supabase
+
+Runs through sql_migrations.py: each file in one transaction over a direct
+Postgres connection (SUPABASE_DB_URL / DATABASE_URL), recorded by checksum
+so re-running is a no-op.
+
+Usage:
+  python3 scripts/apply-mtn-deals-migration.py
+  python3 scripts/apply-mtn-deals-migration.py --mark-applied   # tables already created by hand
 """
 
-import os
-from dotenv import load_dotenv
-from supabase import create_client, Client
+import argparse
+import sys
+import time
+from pathlib import Path
 
-# Load environment variables
-load_dotenv('.env.local')
+from sql_migrations import MigrationError, apply_migrations, database_url
 
-SUPABASE_URL = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+MIGRATIONS = Path('supabase/migrations')
+MTN_MIGRATIONS = [
+    MIGRATIONS / 'archive/20251104105023_create_mtn_business_deals.sql',
+    MIGRATIONS / 'archive/20251106203151_add_mtn_deals_visibility_toggle.sql',
+    MIGRATIONS / '20261019000000_mtn_business_deals_summary.sql',
+    MIGRATIONS / '20261019010000_mtn_deal_frontiers.sql',
+]
 
 def main():
+    parser = argparse.ArgumentParser(description='Apply the MTN Business Deals migrations')
+    parser.add_argument('files', nargs='*', type=Path, default=MTN_MIGRATIONS,
+                        help='migration files (default: the MTN deals migrations, in order)')
+    parser.add_argument('--db-url', help='Postgres connection string (default: SUPABASE_DB_URL / DATABASE_URL)')
+    parser.add_argument('--reapply', action='store_true', help='re-run files changed since they were applied')
+    parser.add_argument('--dry-run', action='store_true', help='report what would run without running it')
+    parser.add_argument('--mark-applied', action='store_true',
+                        help='record the files as applied without running them')
+    args = parser.parse_args()
+
     print("\n" + "="*80)
-    print("APPLYING MTN BUSINESS DEALS MIGRATION")
+    print("APPLYING MTN BUSINESS DEALS MIGRATIONS")
     print("="*80)
-    
-    # Connect to Supabase
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        print("\n[ERROR] Supabase credentials not found in .env.local")
-        return
-    
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    print("\n✓ Connected to Supabase")
-    
-    # Read migration file
-    migration_path = 'supabase/migrations/20251104105023_create_mtn_business_deals.sql'
-    print(f"\nReading migration: {migration_path}")
-    
-    with open(migration_path, 'r', encoding='utf-8') as f:
-        sql = f.read()
-    
-    print(f"✓ Loaded migration ({len(sql)} characters)")
-    
-    # Split into individual statements (basic approach)
-    statements = [s.strip() for s in sql.split(';') if s.strip() and not s.strip().startswith('--')]
-    
-    print(f"\nExecuting {len(statements)} SQL statements...")
-    
-    executed = 0
-    errors = 0
-    
-    for i, statement in enumerate(statements, 1):
-        if not statement:
-            continue
-            
-        try:
-            # Use raw SQL execute
-            supabase.postgrest.session.post(
-                f"{SUPABASE_URL}/rest/v1/rpc/exec",
-                json={"query": statement},
-                headers={
-                    "apikey": SUPABASE_KEY,
-                    "Authorization": f"Bearer {SUPABASE_KEY}",
-                    "Content-Type": "application/json"
-                }
-            )
-            executed += 1
-            if i % 10 == 0:
-                print(f"  ✓ Executed {i}/{len(statements)} statements...")
-        except Exception as e:
-            # Check if error is ignorable (e.g., "already exists")
-            error_msg = str(e).lower()
-            if 'already exists' in error_msg or 'duplicate' in error_msg:
-                print(f"  ⚠ Statement {i} skipped (already exists)")
-                executed += 1
-            else:
-                print(f"  ✗ Statement {i} failed: {e}")
-                errors += 1
-    
+
+    url = args.db_url or database_url()
+    if not url:
+        print("\n[ERROR] Set SUPABASE_DB_URL or DATABASE_URL in .env.local (or pass --db-url)")
+        sys.exit(1)
+    missing = [str(f) for f in args.files if not f.exists()]
+    if missing:
+        print(f"\n[ERROR] Migration not found: {', '.join(missing)}")
+        sys.exit(1)
+
+    print()
+    started = time.perf_counter()
+    try:
+        applied, skipped = apply_migrations(url, args.files, args.reapply, args.dry_run, args.mark_applied)
+    except MigrationError as e:
+        print(f"\n✗ Migration failed and was rolled back: {e}")
+        sys.exit(1)
+
     print(f"\n{'='*80}")
     print(f"MIGRATION COMPLETE")
     print(f"{'='*80}")
-    print(f"Executed: {executed}/{len(statements)}")
-    print(f"Errors: {errors}")
-    
-    if errors == 0:
-        print("\n✓ Migration applied successfully!")
-    else:
-        print(f"\n⚠ Migration completed with {errors} errors")
-    
+    print(f"Applied: {len(applied)}, already up to date: {len(skipped)} "
+          f"({time.perf_counter() - started:.2f}s)")
     print("\n" + "="*80 + "\n")
 
 if __name__ == '__main__':
@@ -3,33 +3,32 @@
 Compare MTN products from JSON file with Supabase database
 """
 
-import json
+import csv
 import os
+import time
 from collections import defaultdict
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
+from deal_snapshot import load_deals, load_table
+from mtn_deals import DEALS_JSON
+from package_matcher import PackageIndex
+
 # Load environment variables
 load_dotenv('.env.local')
 
 SUPABASE_URL = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 
-def load_json_deals():
-    """Load deals from JSON file"""
-    json_path = 'docs/products/01_ACTIVE_PRODUCTS/MTN Deals/Oct-2025/Helios and iLula Business Promos - Oct 2025 - Deals.json'
-    
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    return data['data']['Sheet1']['data']
+def load_json_deals(path=DEALS_JSON):
+    """Deals from the Arrow snapshot of the export, else streamed from it"""
+    return load_deals(path)
 
 def analyze_json_deals(deals):
     """Analyze JSON deals structure"""
     print("=" * 80)
     print("MTN DEALS JSON FILE ANALYSIS")
     print("=" * 80)
-    print(f"\nTotal Deals: {len(deals):,}")
     
     # Group by Price Plan
     price_plans = defaultdict(int)
@@ -37,17 +36,29 @@ def analyze_json_deals(deals):
     devices = defaultdict(int)
     data_bundles = defaultdict(int)
     
-    total_monthly_prices = []
-    total_installation_prices = []
+    # Running totals, so the deals can be streamed in a single pass
+    total = 0
+    monthly_min = monthly_max = installation_min = installation_max = None
+    monthly_sum = 0.0
     
     for deal in deals:
+        total += 1
         price_plans[deal['Price Plan']] += 1
         contract_terms[deal['Contract Term']] += 1
         devices[deal['OEM and Device']] += 1
         data_bundles[deal['Total Data']] += 1
         
-        total_monthly_prices.append(deal['Total Subscription Incl Vat'])
-        total_installation_prices.append(deal['Once-off Pay-in (incl VAT)'])
+        monthly = deal['Total Subscription Incl Vat']
+        installation = deal['Once-off Pay-in (incl VAT)']
+        monthly_sum += monthly
+        monthly_min = monthly if monthly_min is None else min(monthly_min, monthly)
+        monthly_max = monthly if monthly_max is None else max(monthly_max, monthly)
+        installation_min = installation if installation_min is None else min(installation_min, installation)
+        installation_max = installation if installation_max is None else max(installation_max, installation)
+    
+    print(f"\nTotal Deals: {total:,}")
+    if not total:
+        return {'price_plans': price_plans, 'devices': devices, 'data_bundles': data_bundles}
     
     print(f"\n{'='*80}")
     print("PRICE PLANS (Top 20)")
@@ -76,9 +87,9 @@ def analyze_json_deals(deals):
     print(f"\n{'='*80}")
     print("PRICING SUMMARY")
     print(f"{'='*80}")
-    print(f"  Monthly Price Range: R {min(total_monthly_prices):.2f} - R {max(total_monthly_prices):,.2f}")
-    print(f"  Average Monthly Price: R {sum(total_monthly_prices)/len(total_monthly_prices):,.2f}")
-    print(f"  Installation Price Range: R {min(total_installation_prices):.2f} - R {max(total_installation_prices):,.2f}")
+    print(f"  Monthly Price Range: R {monthly_min:.2f} - R {monthly_max:,.2f}")
+    print(f"  Average Monthly Price: R {monthly_sum/total:,.2f}")
+    print(f"  Installation Price Range: R {installation_min:.2f} - R {installation_max:,.2f}")
     
     return {
         'price_plans': price_plans,
@@ -86,6 +97,122 @@ def analyze_json_deals(deals):
         'data_bundles': data_bundles
     }
 
+# Columnar analysis: (section title, column, top N or None for all, sorted by value)
+DIMENSIONS = [
+    ('PRICE PLANS', 'price_plan', 20),
+    ('CONTRACT TERMS', 'contract_term', None),
+    ('DATA BUNDLES', 'total_data', 15),
+    ('DEVICES', 'device', 20),
+]
+PERCENTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+def load_deals_frame(deals):
+    """Load deals into a typed DataFrame: categoricals for the grouping
+    columns, float64 prices. Only the analysed columns are kept.
+
+    `deals` is an iterable of deal dicts or a pyarrow.Table from
+    deal_snapshot.load_table(), whose columns convert without per-row work."""
+    import pandas as pd
+    
+    fields = {
+        'price_plan': 'Price Plan',
+        'contract_term': 'Contract Term',
+        'device': 'OEM and Device',
+        'total_data': 'Total Data',
+        'monthly': 'Total Subscription Incl Vat',
+        'once_off': 'Once-off Pay-in (incl VAT)',
+    }
+    if hasattr(deals, 'column_names'):
+        def category(key):
+            values = deals.column(key).cast('string').dictionary_encode().to_pandas()
+            return values.cat.reorder_categories(sorted(values.cat.categories))
+        return pd.DataFrame({
+            'price_plan': category(fields['price_plan']),
+            'contract_term': pd.Categorical(deals.column(fields['contract_term']).to_pandas().astype('Int16')),
+            'device': category(fields['device']),
+            'total_data': category(fields['total_data']),
+            'monthly': deals.column(fields['monthly']).to_pandas().astype('float64'),
+            'once_off': deals.column(fields['once_off']).to_pandas().astype('float64'),
+        })
+    
+    columns = {col: [] for col in fields}
+    appends = [(columns[col].append, key) for col, key in fields.items()]
+    for deal in deals:
+        for append, key in appends:
+            append(deal[key])
+    
+    def numeric(values):
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').astype('float64')
+    
+    return pd.DataFrame({
+        'price_plan': pd.Categorical([str(v) for v in columns['price_plan']]),
+        'contract_term': pd.Categorical(numeric(columns['contract_term']).astype('Int16')),
+        'device': pd.Categorical([str(v) for v in columns['device']]),
+        'total_data': pd.Categorical([str(v) for v in columns['total_data']]),
+        'monthly': numeric(columns['monthly']),
+        'once_off': numeric(columns['once_off']),
+    })
+
+def analyze_deals_columnar(deals):
+    """Vectorised version of analyze_json_deals() with percentiles and
+    per-term price distributions; returns the same summary dict."""
+    print("=" * 80)
+    print("MTN DEALS JSON FILE ANALYSIS (columnar)")
+    print("=" * 80)
+    
+    import pandas  # noqa: F401  (imported up front so it is not timed as loading)
+    started = time.perf_counter()
+    df = load_deals_frame(deals)
+    loaded = time.perf_counter()
+    print(f"\nTotal Deals: {len(df):,}")
+    
+    counts = {}
+    for title, col, top in DIMENSIONS:
+        vc = df[col].value_counts(sort=False)
+        vc = vc[vc > 0]
+        counts[col] = vc
+        shown = vc.sort_values(ascending=False, kind='stable').head(top) if top else vc.sort_index()
+        print(f"\n{'='*80}")
+        print(f"{title}" + (f" (Top {top})" if top else ""))
+        print(f"{'='*80}")
+        for value, count in shown.items():
+            if col == 'contract_term':
+                print(f"  {value} months: {count:,} deals")
+            else:
+                print(f"  {str(value):50s} {count:>6,} deals")
+    
+    print(f"\n{'='*80}")
+    print("PRICING SUMMARY")
+    print(f"{'='*80}")
+    if len(df):
+        monthly = df['monthly'].describe(percentiles=PERCENTILES)
+        once_off = df['once_off']
+        print(f"  Monthly Price Range: R {monthly['min']:.2f} - R {monthly['max']:,.2f}")
+        print(f"  Average Monthly Price: R {monthly['mean']:,.2f}")
+        print(f"  Monthly Percentiles: " + " | ".join(
+            f"p{int(p * 100)} R {monthly[f'{int(p * 100)}%']:,.2f}" for p in PERCENTILES))
+        print(f"  Installation Price Range: R {once_off.min():.2f} - R {once_off.max():,.2f}")
+        
+        print(f"\n{'='*80}")
+        print("MONTHLY PRICE BY CONTRACT TERM")
+        print(f"{'='*80}")
+        by_term = df.groupby('contract_term', observed=True)['monthly'].describe(percentiles=PERCENTILES)
+        print(f"  {'Term':>6s} {'Deals':>7s} {'Min':>10s} {'p25':>10s} {'Median':>10s} "
+              f"{'p75':>10s} {'Max':>10s} {'Mean':>10s}")
+        for term, row in by_term.iterrows():
+            print(f"  {str(term) + 'M':>6s} {int(row['count']):>7,} {row['min']:>10,.2f} {row['25%']:>10,.2f} "
+                  f"{row['50%']:>10,.2f} {row['75%']:>10,.2f} {row['max']:>10,.2f} {row['mean']:>10,.2f}")
+    
+    print(f"\n  (loaded in {(loaded - started) * 1000:.0f} ms, "
+          f"analysed in {(time.perf_counter() - loaded) * 1000:.0f} ms)")
+    
+    return {
+        'price_plans': counts['price_plan'].to_dict(),
+        'devices': counts['device'].to_dict(),
+        'data_bundles': counts['total_data'].to_dict(),
+        'frame': df,
+    }
+
 def get_supabase_mtn_products(supabase: Client):
     """Get MTN products from Supabase"""
     print(f"\n{'='*80}")
@@ -107,14 +234,13 @@ def get_supabase_mtn_products(supabase: Client):
     
     return mtn_products
 
-def compare_products(json_deals, db_products):
-    """Compare JSON deals with database products"""
+def compare_products(json_price_plans, db_products):
+    """Compare JSON deal price plans with database products"""
     print(f"\n{'='*80}")
     print("COMPARISON ANALYSIS")
     print(f"{'='*80}")
     
-    # Extract unique price plans from JSON
-    json_price_plans = set(deal['Price Plan'] for deal in json_deals)
+    json_price_plans = set(json_price_plans)
     
     # Extract product names from database
     db_product_names = set(product['name'] for product in db_products)
@@ -157,16 +283,60 @@ SUGGESTED ACTION:
 DO NOT mix these with standalone service packages in service_packages table.
     """)
 
+def match_price_plans(price_plans, supabase: Client, k=3, out_path=None):
+    """Rank service_packages candidates for every unique price plan"""
+    print(f"\n{'='*80}")
+    print("PRICE PLAN → SERVICE PACKAGE MATCHES")
+    print(f"{'='*80}")
+    
+    packages = supabase.table('service_packages').select('id,name,service_type,price').execute().data
+    started = time.perf_counter()
+    index = PackageIndex(packages)
+    matches = index.match_all(sorted(price_plans), k=k)
+    elapsed = time.perf_counter() - started
+    
+    matched = sum(1 for hits in matches.values() if hits)
+    print(f"\n{len(matches)} price plans vs {len(packages)} packages in {elapsed * 1000:.0f} ms "
+          f"({matched} with candidates)")
+    for plan, hits in matches.items():
+        best = f"{hits[0][1]['name']} ({hits[0][0]:.2f})" if hits else "—"
+        print(f"  {plan:40s} → {best}")
+    
+    if out_path:
+        with open(out_path, 'w', newline='', encoding='utf-8') as f:
+            w = csv.writer(f)
+            w.writerow(['price_plan', 'rank', 'score', 'package_id', 'package_name', 'service_type', 'price'])
+            for plan, hits in matches.items():
+                for rank, (score, pkg) in enumerate(hits, 1):
+                    w.writerow([plan, rank, score, pkg['id'], pkg['name'], pkg.get('service_type'), pkg.get('price')])
+        print(f"\n✓ Candidates written to {out_path}")
+    
+    return matches
+
 def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Compare MTN deals with Supabase service packages')
+    parser.add_argument('--input', default=str(DEALS_JSON),
+                        help='Deals workbook (.xlsx), JSON from excel-to-json.py, or .jsonl')
+    parser.add_argument('--columnar', action='store_true',
+                        help='Vectorised pandas analysis with percentiles and per-term price distributions')
+    parser.add_argument('--match', action='store_true',
+                        help='Rank service_packages candidates for every unique price plan')
+    parser.add_argument('--match-out', default='mtn_price_plan_matches.csv',
+                        help='CSV of ranked candidates (default: mtn_price_plan_matches.csv)')
+    args = parser.parse_args()
+    
     print("\n" + "="*80)
     print("MTN PRODUCTS COMPARISON: JSON FILE vs SUPABASE DATABASE")
     print("="*80)
     
-    # Load JSON deals
-    deals = load_json_deals()
+    # Load JSON deals; the columnar analysis reads the snapshot's columns directly
+    table = load_table(args.input) if args.columnar else None
+    deals = table if table is not None else load_json_deals(args.input)
     
     # Analyze JSON structure
-    json_analysis = analyze_json_deals(deals)
+    json_analysis = analyze_deals_columnar(deals) if args.columnar else analyze_json_deals(deals)
     
     # Connect to Supabase
     if not SUPABASE_URL or not SUPABASE_KEY:
@@ -180,7 +350,10 @@ def main():
     db_products = get_supabase_mtn_products(supabase)
     
     # Compare
-    compare_products(deals, db_products)
+    compare_products(json_analysis['price_plans'], db_products)
+    
+    if args.match:
+        match_price_plans(json_analysis['price_plans'], supabase, out_path=args.match_out)
     
     print("\n" + "="*80)
     print("ANALYSIS COMPLETE")
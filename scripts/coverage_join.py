@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Point-in-polygon join between geocoded customers and coverage footprints.
+
+Loads coverage polygons (KML or GeoJSON — fibre/LTE footprints exported
+from provider portals or drawn in Google Earth) into a Sort-Tile-Recursive
+(STR) R-tree of polygon bounding boxes. All customer points from the
+spatial index (geocode_to_kml.py --index) are pushed down the tree as
+NumPy index arrays, so each polygon is only ever tested against the points
+already inside its bounding box. That test is a vectorised even-odd ray
+cast over all of the polygon's rings at once, so holes and multi-part
+footprints need no special casing.
+
+Writes:
+  <out>_customers.csv  one row per customer: covered flag, matching polygons
+  <out>_polygons.csv   one row per polygon: customer count, split by tier
+
+Usage:
+  python3 scripts/coverage_join.py fibre_footprint.kml lte.geojson --out /home/circletel/coverage
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import numpy as np
+
+from customer_index import INDEX, CustomerIndex
+from geocode_to_kml import TIERS
+
+NODE_CAPACITY = 16
+# Cap on points × edges per vectorised PIP block, to bound temporary memory.
+PIP_BLOCK = 4_000_000
+
+
+# ── polygon loading ───────────────────────────────────────────────────────────
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _parse_kml_coords(text):
+    pts = []
+    for tok in (text or "").split():
+        parts = tok.split(",")
+        if len(parts) >= 2:
+            pts.append((float(parts[0]), float(parts[1])))
+    return np.array(pts, dtype=np.float64).reshape(-1, 2)
+
+
+def load_kml(path):
+    """Yield (name, [rings]) for every Placemark holding polygons."""
+    n = 0
+    for _, elem in ET.iterparse(str(path), events=("end",)):
+        if _local(elem.tag) != "Placemark":
+            continue
+        n += 1
+        name = next((c.text for c in elem if _local(c.tag) == "name" and c.text), None)
+        rings = [
+            _parse_kml_coords(c.text)
+            for ring in elem.iter() if _local(ring.tag) == "LinearRing"
+            for c in ring if _local(c.tag) == "coordinates"
+        ]
+        rings = [r for r in rings if len(r) >= 3]
+        if rings:
+            yield name or f"{Path(path).stem}#{n}", rings
+        elem.clear()
+
+
+def load_geojson(path):
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    features = data.get("features", [data] if data.get("type") == "Feature" else [])
+    for n, feat in enumerate(features, 1):
+        geom = feat.get("geometry") or {}
+        props = feat.get("properties") or {}
+        if geom.get("type") == "Polygon":
+            polys = [geom["coordinates"]]
+        elif geom.get("type") == "MultiPolygon":
+            polys = geom["coordinates"]
+        else:
+            continue
+        rings = [np.array(ring, dtype=np.float64)[:, :2] for poly in polys for ring in poly]
+        rings = [r for r in rings if len(r) >= 3]
+        if rings:
+            name = props.get("name") or props.get("Name") or feat.get("id") or f"{Path(path).stem}#{n}"
+            yield str(name), rings
+
+
+def load_polygons(paths):
+    """[(name, source, edges)] with edges an (E, 4) array of x1, y1, x2, y2."""
+    polys = []
+    for path in paths:
+        loader = load_geojson if Path(path).suffix.lower() in (".json", ".geojson") else load_kml
+        for name, rings in loader(path):
+            edges = np.concatenate([
+                np.hstack([ring, np.roll(ring, -1, axis=0)]) for ring in rings
+            ])
+            polys.append((name, Path(path).name, edges))
+    return polys
+
+
+# ── STR-tree ──────────────────────────────────────────────────────────────────
+class STRtree:
+    """Static R-tree over bounding boxes, bulk-loaded by Sort-Tile-Recursive."""
+
+    def __init__(self, boxes, capacity=NODE_CAPACITY):
+        self.capacity = capacity
+        self.levels = [(np.asarray(boxes, dtype=np.float64), None)]
+        while len(self.levels[-1][0]) > 1:
+            self.levels.append(self._pack(self.levels[-1][0]))
+
+    def _pack(self, boxes):
+        n = len(boxes)
+        cx = (boxes[:, 0] + boxes[:, 2]) / 2
+        cy = (boxes[:, 1] + boxes[:, 3]) / 2
+        n_nodes = -(-n // self.capacity)
+        n_slices = int(np.ceil(np.sqrt(n_nodes)))
+        per_slice = n_slices * self.capacity
+        order = np.argsort(cx, kind="stable")
+        children = []
+        for s in range(0, n, per_slice):
+            sl = order[s:s + per_slice]
+            sl = sl[np.argsort(cy[sl], kind="stable")]
+            children.extend(sl[i:i + self.capacity] for i in range(0, len(sl), self.capacity))
+        parent = np.array([
+            [boxes[c, 0].min(), boxes[c, 1].min(), boxes[c, 2].max(), boxes[c, 3].max()]
+            for c in children
+        ])
+        return parent, children
+
+    def query_points(self, x, y):
+        """Yield (item, point_indices) for every item whose box holds points."""
+        top = len(self.levels) - 1
+        stack = [(top, i, np.arange(len(x))) for i in range(len(self.levels[top][0]))]
+        while stack:
+            level, i, pts = stack.pop()
+            b = self.levels[level][0][i]
+            px, py = x[pts], y[pts]
+            sub = pts[(px >= b[0]) & (px <= b[2]) & (py >= b[1]) & (py <= b[3])]
+            if not sub.size:
+                continue
+            if level == 0:
+                yield i, sub
+            else:
+                stack.extend((level - 1, c, sub) for c in self.levels[level][1][i])
+
+
+# ── point in polygon ──────────────────────────────────────────────────────────
+def points_in_polygon(x, y, edges):
+    """Even-odd test of points (x, y) against all edges of a polygon's rings."""
+    x1, y1, x2, y2 = edges.T
+    inside = np.zeros(len(x), dtype=bool)
+    step = max(1, PIP_BLOCK // max(1, len(edges)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for s in range(0, len(x), step):
+            px = x[s:s + step, None]
+            py = y[s:s + step, None]
+            straddles = (y1 > py) != (y2 > py)
+            x_cross = (x2 - x1) * (py - y1) / (y2 - y1) + x1
+            inside[s:s + step] = ((straddles & (px < x_cross)).sum(axis=1) & 1).astype(bool)
+    return inside
+
+
+def coverage_join(x, y, polys):
+    """Return ([[polygon indices] per point], [point count per polygon])."""
+    boxes = np.array([[e[:, [0, 2]].min(), e[:, [1, 3]].min(), e[:, [0, 2]].max(), e[:, [1, 3]].max()]
+                      for _, _, e in polys])
+    tree = STRtree(boxes)
+    hits = [[] for _ in range(len(x))]
+    per_poly = np.zeros(len(polys), dtype=np.int64)
+    for pi, cand in tree.query_points(x, y):
+        inside = cand[points_in_polygon(x[cand], y[cand], polys[pi][2])]
+        per_poly[pi] = len(inside)
+        for p in inside.tolist():
+            hits[p].append(pi)
+    return hits, per_poly
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Join geocoded customers against coverage polygons")
+    parser.add_argument("polygons", nargs="+", type=Path, help="coverage KML / GeoJSON files")
+    parser.add_argument("--db", type=Path, default=INDEX, help=f"customer index (default: {INDEX})")
+    parser.add_argument("--out", type=Path, default=Path("coverage"),
+                        help="output prefix (default: ./coverage → coverage_customers.csv, coverage_polygons.csv)")
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        sys.exit(f"ERROR: no index at {args.db}. Build it with: python3 scripts/geocode_to_kml.py --index")
+
+    started = time.perf_counter()
+    polys = load_polygons(args.polygons)
+    if not polys:
+        sys.exit("ERROR: no polygons found")
+    customers = CustomerIndex(args.db).all()
+    x = np.array([c["lng"] for c in customers], dtype=np.float64)
+    y = np.array([c["lat"] for c in customers], dtype=np.float64)
+    loaded = time.perf_counter()
+
+    hits, per_poly = coverage_join(x, y, polys)
+    joined = time.perf_counter()
+
+    tiers = [name for name, _ in TIERS]
+    tier_counts = np.zeros((len(polys), len(tiers)), dtype=np.int64)
+    tier_idx = {t: i for i, t in enumerate(tiers)}
+
+    out_customers = args.out.with_name(args.out.name + "_customers.csv")
+    with open(out_customers, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["account", "tier", "lat", "lng", "covered", "polygon_count", "polygons", "address"])
+        for c, ph in zip(customers, hits):
+            for pi in ph:
+                tier_counts[pi, tier_idx.get(c["tier"], len(tiers) - 1)] += 1
+            w.writerow([c["account"], c["tier"], c["lat"], c["lng"], int(bool(ph)), len(ph),
+                        "; ".join(polys[pi][0] for pi in ph), c["address"]])
+
+    out_polygons = args.out.with_name(args.out.name + "_polygons.csv")
+    with open(out_polygons, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["polygon", "source", "vertices", "customers"] + tiers)
+        for (name, source, edges), n, tc in zip(polys, per_poly, tier_counts):
+            w.writerow([name, source, len(edges), int(n)] + tc.tolist())
+
+    covered = sum(1 for ph in hits if ph)
+    print(f"Loaded {len(polys)} polygons and {len(customers)} customers in {(loaded - started):.2f}s")
+    print(f"Join done in {(joined - loaded) * 1000:.0f} ms")
+    if customers:
+        print(f"  Covered:     {covered} ({covered / len(customers):.1%})")
+        print(f"  Not covered: {len(customers) - covered}")
+    print(f"Written → {out_customers}, {out_polygons}")
+
+
+if __name__ == "__main__":
+    main()
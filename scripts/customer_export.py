@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Export geocoded customers for web maps: GeoJSON and Mapbox vector tiles.
+
+Reads the spatial index written by `geocode_to_kml.py --index` and emits
+the same price-tier styling that tier_for() gives the KML (tier name,
+style id and a web #RRGGBB colour), so the Next.js dashboards can render
+customers without parsing KML.
+
+  geojson  one FeatureCollection, streamed feature by feature
+  geojsonl newline-delimited features (one per line) for tippecanoe /
+           ogr2ogr / incremental readers
+  tiles    a z/x/y.pbf pyramid of Mapbox Vector Tiles (layer "customers")
+           plus a TileJSON metadata.json, servable as static files and
+           loadable directly by MapLibre / Mapbox GL; below --detail-zoom
+           nearby customers of one tier are merged into a single point
+           with a "count" of the customers it stands for
+
+Usage:
+  python3 scripts/customer_export.py geojson public/maps/customers.geojson
+  python3 scripts/customer_export.py tiles public/maps/customers --max-zoom 14
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from pathlib import Path
+
+from customer_index import INDEX, CustomerIndex
+from geocode_to_kml import STYLE_IDS
+
+LAYER = "customers"
+EXTENT = 4096
+MIN_ZOOM = 4
+MAX_ZOOM = 14
+# Below this zoom tiles only carry styling attributes, and customers are
+# merged into one point per tier per CLUSTER_CELL x CLUSTER_CELL tile units
+# (4 x 4 screen pixels of a 256 px tile), placed at their mean position
+# with a "count" attribute. A low-zoom tile then holds at most 64 x 64
+# points per tier however large the customer base grows.
+DETAIL_ZOOM = 10
+CLUSTER_CELL = EXTENT // 64
+
+STYLE_PROPS = ("tier", "style_id", "colour")
+DETAIL_PROPS = ("account", "package", "monthly_fee", "fee", "precision")
+
+
+def web_colour(kml_colour):
+    """KML aabbggrr → web #rrggbb."""
+    return f"#{kml_colour[6:8]}{kml_colour[4:6]}{kml_colour[2:4]}"
+
+
+WEB_COLOURS = {sid: web_colour(c) for sid, c in STYLE_IDS.items()}
+
+
+def properties(c, detail=True):
+    props = {
+        "tier": c["tier"],
+        "style_id": c["style_id"],
+        "colour": WEB_COLOURS.get(c["style_id"], "#888888"),
+    }
+    if detail:
+        for key in DETAIL_PROPS:
+            if c.get(key) is not None:
+                props[key] = c[key]
+    return props
+
+
+def _feature(c):
+    return {
+        "type": "Feature",
+        "id": c["id"],
+        "geometry": {"type": "Point", "coordinates": [round(c["lng"], 6), round(c["lat"], 6)]},
+        "properties": properties(c),
+    }
+
+
+def _atomic(path, write, mode="w"):
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp, mode, encoding="utf-8") as f:
+            n = write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+    return n
+
+
+def write_geojson(path, customers):
+    """Stream a FeatureCollection; returns the feature count."""
+    def write(f):
+        n = 0
+        f.write('{"type":"FeatureCollection","features":[\n')
+        for c in customers:
+            f.write(("," if n else "") + json.dumps(_feature(c), ensure_ascii=False, separators=(",", ":")) + "\n")
+            n += 1
+        f.write("]}\n")
+        return n
+    return _atomic(path, write)
+
+
+def write_geojsonl(path, customers):
+    """One GeoJSON Feature per line; returns the feature count."""
+    def write(f):
+        n = 0
+        for c in customers:
+            f.write(json.dumps(_feature(c), ensure_ascii=False, separators=(",", ":")) + "\n")
+            n += 1
+        return n
+    return _atomic(path, write)
+
+
+# ── Mapbox Vector Tile encoding (spec v2.1, points only) ─────────────────────
+def _varint(n):
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+
+def _field(num, wire, payload):
+    key = _varint((num << 3) | wire)
+    if wire == 2:
+        return key + _varint(len(payload)) + payload
+    return key + payload
+
+
+def _packed(num, values):
+    return _field(num, 2, b"".join(_varint(v) for v in values))
+
+
+def _value(v):
+    if isinstance(v, bool):
+        return _field(7, 0, _varint(int(v)))
+    if isinstance(v, int):
+        return _field(6, 0, _varint(_zigzag(v)))
+    if isinstance(v, float):
+        return _field(3, 1, struct.pack("<d", v))
+    return _field(1, 2, str(v).encode("utf-8"))
+
+
+def encode_tile(features, layer=LAYER, extent=EXTENT):
+    """features: [(id, x, y, props)] with x/y in tile pixel space → MVT bytes."""
+    keys, key_idx = [], {}
+    values, value_idx = [], {}
+    body = []
+    for fid, x, y, props in features:
+        tags = []
+        for k, v in props.items():
+            if k not in key_idx:
+                key_idx[k] = len(keys)
+                keys.append(k)
+            vk = (type(v).__name__, v)
+            if vk not in value_idx:
+                value_idx[vk] = len(values)
+                values.append(v)
+            tags += [key_idx[k], value_idx[vk]]
+        geometry = [(1 & 0x7) | (1 << 3), _zigzag(x), _zigzag(y)]  # MoveTo(1)
+        feat = (_field(1, 0, _varint(fid)) + _packed(2, tags)
+                + _field(3, 0, _varint(1)) + _packed(4, geometry))
+        body.append(_field(2, 2, feat))
+    msg = (_field(15, 0, _varint(2)) + _field(1, 2, layer.encode("utf-8"))
+           + b"".join(body)
+           + b"".join(_field(3, 2, k.encode("utf-8")) for k in keys)
+           + b"".join(_field(4, 2, _value(v)) for v in values)
+           + _field(5, 0, _varint(extent)))
+    return _field(3, 2, msg)
+
+
+def _mercator(lat, lng):
+    """Web-mercator position in [0, 1) world units."""
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = (lng + 180.0) / 360.0
+    s = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)
+    return x, y
+
+
+def write_tiles(out_dir, customers, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, detail_zoom=DETAIL_ZOOM,
+                force=False):
+    """Write {z}/{x}/{y}.pbf + metadata.json; returns the tile count.
+
+    An existing out_dir is replaced only if it holds a metadata.json from an
+    earlier export, or with force=True.
+    """
+    out_dir = Path(out_dir)
+    if out_dir.exists() and not force and not (out_dir / "metadata.json").is_file():
+        raise FileExistsError(f"{out_dir} exists and is not a previous tile export "
+                              f"(no metadata.json); pass --force to replace it")
+    pts = []
+    west = south = 180.0
+    east = north = -180.0
+    for c in customers:
+        mx, my = _mercator(c["lat"], c["lng"])
+        pts.append((c["id"], mx, my, properties(c, detail=False), properties(c)))
+        west, east = min(west, c["lng"]), max(east, c["lng"])
+        south, north = min(south, c["lat"]), max(north, c["lat"])
+    if not pts:
+        raise ValueError("no customers to tile")
+
+    staging = Path(tempfile.mkdtemp(prefix="tiles_", dir=out_dir.parent))
+    count = 0
+    try:
+        for z in range(min_zoom, max_zoom + 1):
+            scale = 1 << z
+            tiles = {}
+            cells = {}          # (tile, cell, tier) → [first fid, sum px, sum py, props, count]
+            for fid, mx, my, style, detail in pts:
+                wx, wy = mx * scale, my * scale
+                tx, ty = min(int(wx), scale - 1), min(int(wy), scale - 1)
+                px = int((wx - tx) * EXTENT)
+                py = int((wy - ty) * EXTENT)
+                if z >= detail_zoom:
+                    tiles.setdefault((tx, ty), []).append((fid, px, py, detail))
+                    continue
+                key = (tx, ty, px // CLUSTER_CELL, py // CLUSTER_CELL, style["style_id"])
+                cell = cells.get(key)
+                if cell:
+                    cell[1] += px
+                    cell[2] += py
+                    cell[4] += 1
+                else:
+                    cells[key] = [fid, px, py, style, 1]
+            for (tx, ty, *_), (fid, sx, sy, style, n) in cells.items():
+                tiles.setdefault((tx, ty), []).append((fid, sx // n, sy // n, {**style, "count": n}))
+            for (tx, ty), feats in tiles.items():
+                tile_dir = staging / str(z) / str(tx)
+                tile_dir.mkdir(parents=True, exist_ok=True)
+                (tile_dir / f"{ty}.pbf").write_bytes(encode_tile(feats))
+                count += 1
+
+        fields = {k: "String" for k in STYLE_PROPS + DETAIL_PROPS}
+        fields["fee"] = "Number"
+        fields["count"] = "Number"
+        (staging / "metadata.json").write_text(json.dumps({
+            "tilejson": "3.0.0",
+            "name": "CircleTel customers",
+            "tiles": ["{z}/{x}/{y}.pbf"],
+            "minzoom": min_zoom,
+            "maxzoom": max_zoom,
+            "bounds": [west, south, east, north],
+            "vector_layers": [{"id": LAYER, "fields": fields,
+                               "minzoom": min_zoom, "maxzoom": max_zoom}],
+        }, indent=2))
+
+        if out_dir.is_dir():
+            shutil.rmtree(out_dir)
+        elif out_dir.exists():
+            out_dir.unlink()
+        os.replace(staging, out_dir)
+    finally:
+        if staging.exists():
+            shutil.rmtree(staging)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export geocoded customers as GeoJSON / vector tiles")
+    parser.add_argument("--db", type=Path, default=INDEX, help=f"customer index (default: {INDEX})")
+    sub = parser.add_subparsers(dest="fmt", required=True)
+    for fmt in ("geojson", "geojsonl"):
+        p = sub.add_parser(fmt)
+        p.add_argument("output", type=Path)
+    t = sub.add_parser("tiles", help="z/x/y.pbf vector tile pyramid")
+    t.add_argument("output", type=Path, help="output directory")
+    t.add_argument("--min-zoom", type=int, default=MIN_ZOOM)
+    t.add_argument("--max-zoom", type=int, default=MAX_ZOOM)
+    t.add_argument("--detail-zoom", type=int, default=DETAIL_ZOOM,
+                   help=f"first zoom carrying account/package/fee attributes (default: {DETAIL_ZOOM})")
+    t.add_argument("--force", action="store_true",
+                   help="replace the output directory even if it is not a previous tile export")
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        sys.exit(f"ERROR: no index at {args.db}. Build it with: python3 scripts/geocode_to_kml.py --index")
+    customers = CustomerIndex(args.db).iter()
+
+    if args.fmt == "geojson":
+        n = write_geojson(args.output, customers)
+        print(f"GeoJSON written → {args.output} ({n} features)")
+    elif args.fmt == "geojsonl":
+        n = write_geojsonl(args.output, customers)
+        print(f"GeoJSONL written → {args.output} ({n} features)")
+    else:
+        try:
+            n = write_tiles(args.output, customers, args.min_zoom, args.max_zoom, args.detail_zoom,
+                            force=args.force)
+        except FileExistsError as e:
+            sys.exit(f"ERROR: {e}")
+        print(f"Vector tiles written → {args.output} ({n} tiles, z{args.min_zoom}–{args.max_zoom})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Customer density heatmaps by price tier.
+
+Bins the geocoded customers from the spatial index (geocode_to_kml.py
+--index) into a regular lat/lng grid — one layer per price tier plus an
+"All customers" layer — with optional Gaussian smoothing, all as NumPy
+array operations (one bincount for every tier, separable convolution for
+the blur). A national grid at 1 km cells builds in well under a second.
+
+Writes to the output directory:
+  heatmap_<tier>.png   RGBA overlays (tier colour, alpha ∝ density)
+  heatmap.kml          GroundOverlays for the PNGs (or heatmap.kmz, --kmz)
+  heatmap.npz          raw grids, tier names and bounds for further analysis
+
+Usage:
+  python3 scripts/customer_heatmap.py /home/circletel/heatmap --cell-km 1 --sigma 2
+"""
+
+import argparse
+import re
+import struct
+import sys
+import time
+import zipfile
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from customer_index import INDEX, KM_PER_DEG_LAT, CustomerIndex
+from geocode_to_kml import TIERS, xml_escape
+
+ALL = "All customers"
+# Ramp for the combined layer: transparent yellow → orange → deep red.
+ALL_RAMP = np.array([[255, 255, 128], [255, 140, 0], [178, 0, 0]], dtype=np.float32)
+
+
+def load_points(index):
+    rows = index.conn.execute("SELECT lat, lng, tier FROM customers").fetchall()
+    order = {name: i for i, (name, _) in enumerate(TIERS)}
+    lat = np.fromiter((r[0] for r in rows), dtype=np.float64, count=len(rows))
+    lng = np.fromiter((r[1] for r in rows), dtype=np.float64, count=len(rows))
+    tier = np.fromiter((order.get(r[2], len(TIERS) - 1) for r in rows), dtype=np.int64, count=len(rows))
+    return lat, lng, tier
+
+
+def grid_spec(lat, lng, cell_km, pad_cells, bounds=None):
+    """Grid geometry: (south, west, north, east, cell_lat, cell_lng, ny, nx)."""
+    if bounds:
+        south, west, north, east = bounds
+    else:
+        south, north = lat.min(), lat.max()
+        west, east = lng.min(), lng.max()
+    cell_lat = cell_km / KM_PER_DEG_LAT
+    cell_lng = cell_km / (KM_PER_DEG_LAT * np.cos(np.radians((south + north) / 2)))
+    south -= pad_cells * cell_lat
+    north += pad_cells * cell_lat
+    west -= pad_cells * cell_lng
+    east += pad_cells * cell_lng
+    ny = max(1, int(np.ceil((north - south) / cell_lat)))
+    nx = max(1, int(np.ceil((east - west) / cell_lng)))
+    # Snap the far edges to whole cells so the overlay lines up exactly.
+    return south, west, south + ny * cell_lat, west + nx * cell_lng, cell_lat, cell_lng, ny, nx
+
+
+def bin_points(lat, lng, tier, n_tiers, spec):
+    """Count grid of shape (n_tiers, ny, nx); row 0 is the northern edge."""
+    south, west, north, east, cell_lat, cell_lng, ny, nx = spec
+    iy = ((north - lat) / cell_lat).astype(np.int64)
+    ix = ((lng - west) / cell_lng).astype(np.int64)
+    keep = (iy >= 0) & (iy < ny) & (ix >= 0) & (ix < nx)
+    flat = (tier[keep] * ny + iy[keep]) * nx + ix[keep]
+    counts = np.bincount(flat, minlength=n_tiers * ny * nx)
+    return counts.reshape(n_tiers, ny, nx).astype(np.float32)
+
+
+def gaussian_kernel(sigma):
+    radius = max(1, int(round(3 * sigma)))
+    x = np.arange(-radius, radius + 1, dtype=np.float32)
+    k = np.exp(-(x * x) / (2 * sigma * sigma))
+    return k / k.sum()
+
+
+def smooth(grids, sigma):
+    """Separable Gaussian blur over the last two axes (cells), all layers at once."""
+    if sigma <= 0:
+        return grids
+    k = gaussian_kernel(sigma)
+    r = len(k) // 2
+    windows = np.lib.stride_tricks.sliding_window_view
+    out = np.pad(grids, ((0, 0), (0, 0), (r, r)))
+    out = windows(out, len(k), axis=2) @ k
+    out = np.pad(out, ((0, 0), (r, r), (0, 0)))
+    out = windows(out, len(k), axis=1) @ k
+    return out.astype(np.float32)
+
+
+def kml_rgb(kml_colour):
+    """KML aabbggrr → (r, g, b)."""
+    return int(kml_colour[6:8], 16), int(kml_colour[4:6], 16), int(kml_colour[2:4], 16)
+
+
+def colourize(grid, rgb=None, max_alpha=220):
+    """RGBA uint8 image: alpha ∝ sqrt(density) so sparse areas stay visible."""
+    peak = grid.max()
+    d = np.sqrt(grid / peak) if peak > 0 else np.zeros_like(grid)
+    img = np.zeros(grid.shape + (4,), dtype=np.uint8)
+    if rgb is None:
+        pos = d * (len(ALL_RAMP) - 1)
+        for c in range(3):
+            img[..., c] = np.interp(pos, np.arange(len(ALL_RAMP)), ALL_RAMP[:, c]).astype(np.uint8)
+    else:
+        img[..., :3] = rgb
+    img[..., 3] = (d * max_alpha).astype(np.uint8)
+    return img
+
+
+def png_bytes(rgba):
+    h, w, _ = rgba.shape
+    raw = np.concatenate([np.zeros((h, 1), dtype=np.uint8), rgba.reshape(h, w * 4)], axis=1)
+
+    def chunk(tag, data):
+        return (struct.pack(">I", len(data)) + tag + data
+                + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF))
+
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 6, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw.tobytes(), 3))
+            + chunk(b"IEND", b""))
+
+
+def slug(name):
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_") or "tier"
+
+
+def overlay_kml(layers, spec):
+    south, west, north, east = spec[:4]
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<kml xmlns="http://www.opengis.net/kml/2.2">\n'
+        '<Document>\n'
+        '  <name>CircleTel Customer Density</name>\n'
+        '  <description>Customer density by monthly fee tier</description>\n'
+    ]
+    for i, (name, href, count) in enumerate(layers):
+        parts.append(
+            f"  <GroundOverlay>\n"
+            f"    <name>{xml_escape(name)} ({count} customers)</name>\n"
+            f"    <visibility>{1 if i == 0 else 0}</visibility>\n"
+            f"    <Icon><href>{href}</href></Icon>\n"
+            f"    <LatLonBox><north>{north}</north><south>{south}</south>"
+            f"<east>{east}</east><west>{west}</west></LatLonBox>\n"
+            f"  </GroundOverlay>\n"
+        )
+    parts.append("</Document>\n</kml>\n")
+    return "".join(parts)
+
+
+def build_heatmaps(lat, lng, tier, cell_km=1.0, sigma=2.0, bounds=None):
+    """Return (names, grids, spec); grids[0] is the all-customer layer."""
+    names = [name for name, _ in TIERS]
+    spec = grid_spec(lat, lng, cell_km, int(np.ceil(3 * sigma)) if sigma > 0 else 1, bounds)
+    grids = bin_points(lat, lng, tier, len(names), spec)
+    grids = np.concatenate([grids.sum(axis=0, keepdims=True), grids])
+    return [ALL] + names, smooth(grids, sigma), spec
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Customer density heatmaps by price tier")
+    parser.add_argument("output", type=Path, help="output directory")
+    parser.add_argument("--db", type=Path, default=INDEX, help=f"customer index (default: {INDEX})")
+    parser.add_argument("--cell-km", type=float, default=1.0, help="grid cell size in km (default: 1)")
+    parser.add_argument("--sigma", type=float, default=2.0,
+                        help="Gaussian smoothing radius in cells, 0 for raw counts (default: 2)")
+    parser.add_argument("--bounds", type=float, nargs=4, metavar=("SOUTH", "WEST", "NORTH", "EAST"),
+                        help="map and count only customers inside this box (default: fit them all)")
+    parser.add_argument("--kmz", action="store_true", help="bundle the overlays into heatmap.kmz")
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        sys.exit(f"ERROR: no index at {args.db}. Build it with: python3 scripts/geocode_to_kml.py --index")
+    lat, lng, tier = load_points(CustomerIndex(args.db))
+    if not len(lat):
+        sys.exit("ERROR: the customer index is empty")
+    if args.bounds:
+        # Only customers inside the box are mapped and counted
+        south, west, north, east = args.bounds
+        inside = (lat >= south) & (lat <= north) & (lng >= west) & (lng <= east)
+        lat, lng, tier = lat[inside], lng[inside], tier[inside]
+        if not len(lat):
+            sys.exit("ERROR: no customers inside --bounds")
+
+    started = time.perf_counter()
+    names, grids, spec = build_heatmaps(lat, lng, tier, args.cell_km, args.sigma, args.bounds)
+    built = time.perf_counter() - started
+    counts = np.concatenate([[len(tier)], np.bincount(tier, minlength=len(TIERS))])
+    rgbs = [None] + [kml_rgb(colour) for _, colour in TIERS]
+    images = [(name, int(n), png_bytes(colourize(g, rgb)))
+              for name, g, rgb, n in zip(names, grids, rgbs, counts) if n]
+    rendered = time.perf_counter() - started - built
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    layers = []
+    files = {}
+    for name, n, png in images:
+        href = f"heatmap_{slug(name)}.png"
+        files[href] = png
+        layers.append((name, href, n))
+    kml = overlay_kml(layers, spec)
+
+    if args.kmz:
+        with zipfile.ZipFile(args.output / "heatmap.kmz", "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("doc.kml", kml)
+            for href, png in files.items():
+                zf.writestr(href, png)
+    else:
+        for href, png in files.items():
+            (args.output / href).write_bytes(png)
+        (args.output / "heatmap.kml").write_text(kml, encoding="utf-8")
+    np.savez_compressed(args.output / "heatmap.npz", grids=grids, tiers=np.array(names),
+                        bounds=np.array(spec[:4]), cell_km=args.cell_km, sigma=args.sigma)
+
+    ny, nx = grids.shape[1:]
+    print(f"Grids built in {built * 1000:.0f} ms ({len(lat)} customers, "
+          f"{nx}×{ny} cells of {args.cell_km:g} km, sigma={args.sigma:g}); "
+          f"PNGs rendered in {rendered * 1000:.0f} ms")
+    print(f"Written → {args.output}")
+    for name, _, n in layers:
+        print(f"  {name}: {n}")
+
+
+if __name__ == "__main__":
+    main()
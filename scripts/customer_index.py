@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Persisted spatial index over geocoded customers.
+
+geocode_to_kml.py --index writes every customer it places on the map into
+a SQLite database with an R*Tree over their coordinates, alongside the
+account, package, fee and price tier. This module answers the questions
+the KML cannot:
+
+  "which customers are within 2 km of this site/tower?"
+  "who are the nearest 10 customers to this address?"
+
+Both are an R*Tree bounding-box probe followed by an exact haversine
+filter, so they answer in milliseconds over the whole base.
+
+Usage:
+  python3 scripts/customer_index.py within -26.1076 28.0567 2
+  python3 scripts/customer_index.py within --address "12 Main Rd, Sandton, 2196" 2
+  python3 scripts/customer_index.py nearest -26.1076 28.0567 -k 10
+  python3 scripts/customer_index.py stats
+"""
+
+import argparse
+import math
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+BASE = Path("/home/circletel")
+INDEX = BASE / "customer_index.sqlite"
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+FIELDS = ("account", "package", "monthly_fee", "fee", "tier", "style_id",
+          "address", "lat", "lng", "precision")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    id          INTEGER PRIMARY KEY,
+    account     TEXT,
+    package     TEXT,
+    monthly_fee TEXT,
+    fee         REAL,
+    tier        TEXT,
+    style_id    TEXT,
+    address     TEXT,
+    lat         REAL NOT NULL,
+    lng         REAL NOT NULL,
+    precision   TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_customers_account ON customers(account);
+CREATE VIRTUAL TABLE IF NOT EXISTS customers_rtree USING rtree(
+    id, min_lat, max_lat, min_lng, max_lng
+);
+"""
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bbox(lat, lng, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng) enclosing a circle of radius_km."""
+    dlat = radius_km / KM_PER_DEG_LAT
+    coslat = max(math.cos(math.radians(lat)), 1e-6)
+    dlng = min(180.0, radius_km / (KM_PER_DEG_LAT * coslat))
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+
+class CustomerIndex:
+    def __init__(self, path=INDEX):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+
+    def rebuild(self, rows):
+        """Replace the index contents with `rows` (dicts keyed by FIELDS)."""
+        try:
+            self.begin_rebuild()
+            for row in rows:
+                self.add(row)
+            return self.finish_rebuild()
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+    def begin_rebuild(self):
+        """Start replacing the index contents: add() each row, then
+        finish_rebuild(). Nothing is committed until then, so readers keep
+        seeing the previous index and a failed run leaves it intact."""
+        self.conn.execute("DELETE FROM customers")
+        self.conn.execute("DELETE FROM customers_rtree")
+
+    def add(self, row):
+        cols = ", ".join(FIELDS)
+        marks = ", ".join("?" for _ in FIELDS)
+        self.conn.execute(f"INSERT INTO customers ({cols}) VALUES ({marks})",
+                          tuple(row.get(f) for f in FIELDS))
+
+    def finish_rebuild(self):
+        """Index the added rows spatially and commit; returns the row count."""
+        self.conn.execute(
+            "INSERT INTO customers_rtree (id, min_lat, max_lat, min_lng, max_lng) "
+            "SELECT id, lat, lat, lng, lng FROM customers")
+        self.conn.commit()
+        return len(self)
+
+    def iter(self):
+        """Stream every indexed customer as a dict, in insertion order."""
+        for row in self.conn.execute("SELECT * FROM customers ORDER BY id"):
+            yield dict(row)
+
+    def all(self):
+        """Every indexed customer as a dict."""
+        return list(self.iter())
+
+    def _in_box(self, box):
+        return self.conn.execute(
+            "SELECT c.* FROM customers_rtree r JOIN customers c ON c.id = r.id "
+            "WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lng >= ? AND r.min_lng <= ?",
+            box,
+        )
+
+    def within(self, lat, lng, radius_km):
+        """[(distance_km, customer)] within radius_km, nearest first."""
+        hits = []
+        for row in self._in_box(bbox(lat, lng, radius_km)):
+            d = haversine_km(lat, lng, row["lat"], row["lng"])
+            if d <= radius_km:
+                hits.append((d, dict(row)))
+        hits.sort(key=lambda h: h[0])
+        return hits
+
+    def nearest(self, lat, lng, k=10, start_km=1.0):
+        """The k nearest customers as [(distance_km, customer)].
+
+        Searches a growing circle: a result set is exact once it holds k
+        customers inside the current radius.
+        """
+        total = len(self)
+        k = min(k, total)
+        if k <= 0:
+            return []
+        radius = start_km
+        while True:
+            hits = self.within(lat, lng, radius)
+            if len(hits) >= k or radius >= math.pi * EARTH_RADIUS_KM:
+                return hits[:k]
+            radius *= 2
+
+
+def resolve_address(address):
+    """Coordinates for an address via the geocode cache/API, else the gazetteer."""
+    import geocode_to_kml as g
+    from geocode_cache import GeocodeCache
+    from postcode_gazetteer import GAZETTEER, Gazetteer
+
+    if g.API_KEY:
+        coords = g.geocode(address, GeocodeCache(g.CACHE))
+    elif g.CACHE.exists():
+        coords = GeocodeCache(g.CACHE).get(g.normalize_address(address))
+    else:
+        coords = None
+    if coords:
+        return coords
+    if GAZETTEER.exists():
+        hit = Gazetteer(GAZETTEER).lookup(g.normalize_address(address))
+        if hit:
+            return hit[0], hit[1]
+    return None
+
+
+def _print_hits(hits, elapsed):
+    for d, c in hits:
+        print(f"  {d:7.3f} km  {c['account'] or '—':12s} {c['tier']:12s} "
+              f"{(c['package'] or '—')[:30]:30s} {c['address']}")
+    print(f"{len(hits)} customers ({elapsed * 1000:.2f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Radius / nearest queries over geocoded customers")
+    parser.add_argument("--db", type=Path, default=INDEX, help=f"index database (default: {INDEX})")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    w = sub.add_parser("within", help="customers within a radius")
+    w.add_argument("coords", nargs="*", type=float, help="LAT LNG RADIUS_KM (or RADIUS_KM with --address)")
+    w.add_argument("--address", help="centre the search on this address instead of LAT LNG")
+
+    n = sub.add_parser("nearest", help="k nearest customers")
+    n.add_argument("coords", nargs="*", type=float, help="LAT LNG (omit with --address)")
+    n.add_argument("--address", help="centre the search on this address instead of LAT LNG")
+    n.add_argument("-k", type=int, default=10, help="number of customers (default: 10)")
+
+    sub.add_parser("stats", help="index summary")
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        sys.exit(f"ERROR: no index at {args.db}. Build it with: python3 scripts/geocode_to_kml.py --index")
+    index = CustomerIndex(args.db)
+
+    if args.cmd == "stats":
+        print(f"{args.db}: {len(index)} customers")
+        for tier, count in index.conn.execute(
+                "SELECT tier, COUNT(*) FROM customers GROUP BY tier ORDER BY 2 DESC"):
+            print(f"  {tier:14s} {count:>7,}")
+        return
+
+    coords = list(args.coords)
+    if args.address:
+        centre = resolve_address(args.address)
+        if centre is None:
+            sys.exit(f"ERROR: could not locate {args.address!r}")
+        coords = [centre[0], centre[1]] + coords
+        print(f"{args.address} → {centre[0]:.5f}, {centre[1]:.5f}")
+
+    started = time.perf_counter()
+    if args.cmd == "within":
+        if len(coords) != 3:
+            parser.error("within needs LAT LNG RADIUS_KM (or --address ADDRESS RADIUS_KM)")
+        hits = index.within(*coords)
+    else:
+        if len(coords) != 2:
+            parser.error("nearest needs LAT LNG (or --address ADDRESS)")
+        hits = index.nearest(coords[0], coords[1], k=args.k)
+    _print_hits(hits, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
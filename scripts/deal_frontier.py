@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Cheapest-deal frontiers per device and contract term.
+
+For each (device, contract term) only the Pareto-optimal deals are kept:
+those that no other deal beats on every axis at once (lower or equal
+monthly price, once-off pay-in, more or equal data and minutes). Sorted
+by monthly price, a frontier answers "cheapest way to get device X on a
+24-month term with at least N GB" (optionally a minutes floor or
+once-off ceiling) with its first qualifying entry — any deal that
+satisfies the constraints is either on the frontier or dominated by one
+that is, and the dominating deal satisfies them too.
+
+import-mtn-deals.py builds the frontiers from the deals it has just
+mapped and stores them in public.mtn_deal_frontiers, keyed on
+(device_name, contract_term), so a lookup is one primary-key read.
+
+Usage:
+  python3 scripts/deal_frontier.py "Samsung Galaxy S25 5G" --term 24 --min-data 20
+  python3 scripts/deal_frontier.py "Apple iPhone 16" --term 36 --file frontiers.json
+  python3 scripts/deal_frontier.py --build frontiers.json      # from the deals sheet, no database
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+from deal_snapshot import load_deals
+from mtn_deals import DEALS_JSON, parse_data_gb, parse_minutes
+
+TABLE = 'mtn_deal_frontiers'
+
+
+def entry(record):
+    """The compact frontier entry for a mapped mtn_business_deals record."""
+    return {
+        'deal_id': record['deal_id'],
+        'price_plan': record['price_plan'],
+        'monthly': record['monthly_price_incl_vat'],
+        'once_off': record['device_payment_incl_vat'],
+        'data_gb': parse_data_gb(record.get('total_data')),
+        'minutes': parse_minutes(record.get('total_minutes')),
+    }
+
+
+def pareto_front(entries):
+    """Non-dominated entries, cheapest monthly first.
+
+    Sorting by (monthly, once_off, -data, -minutes) means an entry can only
+    be dominated by one already kept, so each is checked against the
+    (short) frontier so far.
+    """
+    front = []
+    for e in sorted(entries, key=lambda e: (e['monthly'], e['once_off'], -e['data_gb'], -e['minutes'])):
+        if not any(f['once_off'] <= e['once_off'] and f['data_gb'] >= e['data_gb']
+                   and f['minutes'] >= e['minutes'] for f in front):
+            front.append(e)
+    return front
+
+
+def build_frontiers(records):
+    """{(device_name, contract_term): frontier} over mapped deal records."""
+    groups = defaultdict(list)
+    for record in records:
+        if record.get('device_name'):
+            groups[(record['device_name'], record['contract_term'])].append(entry(record))
+    return {key: pareto_front(entries) for key, entries in groups.items()}
+
+
+def cheapest(frontier, min_data_gb=0, min_minutes=0, max_once_off=None):
+    """First (cheapest monthly) frontier entry meeting the constraints, else None."""
+    for e in frontier:
+        if (e['data_gb'] >= min_data_gb and e['minutes'] >= min_minutes
+                and (max_once_off is None or e['once_off'] <= max_once_off)):
+            return e
+    return None
+
+
+def store_frontiers(supabase, frontiers, source=None, batch_size=200):
+    """Replace public.mtn_deal_frontiers with `frontiers`; returns rows written.
+
+    Rows are upserted on (device_name, contract_term) with one built_at stamp,
+    then rows from earlier builds (devices / terms no longer in the sheet)
+    are deleted.
+    """
+    built_at = datetime.now(timezone.utc).isoformat()
+    rows = [{
+        'device_name': device,
+        'contract_term': term,
+        'deals': front,
+        'deal_count': len(front),
+        'source': source,
+        'built_at': built_at,
+    } for (device, term), front in frontiers.items()]
+    for i in range(0, len(rows), batch_size):
+        (supabase.table(TABLE)
+         .upsert(rows[i:i + batch_size], on_conflict='device_name,contract_term', returning='minimal')
+         .execute())
+    supabase.table(TABLE).delete().lt('built_at', built_at).execute()
+    return len(rows)
+
+
+def fetch_frontier(supabase, device, term):
+    """One keyed read of a stored frontier ([] when the pair has no deals)."""
+    result = (supabase.table(TABLE)
+              .select('deals')
+              .eq('device_name', device)
+              .eq('contract_term', term)
+              .limit(1)
+              .execute())
+    return result.data[0]['deals'] if result.data else []
+
+
+def write_frontiers(frontiers, path, source=None):
+    """Save frontiers as {device: {term: frontier}} JSON."""
+    nested = defaultdict(dict)
+    for (device, term), front in sorted(frontiers.items()):
+        nested[device][str(term)] = front
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'source': source, 'built_at': datetime.now(timezone.utc).isoformat(),
+                   'frontiers': nested}, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def read_frontiers(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        nested = json.load(f)['frontiers']
+    return {(device, int(term)): front
+            for device, terms in nested.items() for term, front in terms.items()}
+
+
+def _records_from_sheet(path):
+    """Just the fields entry() reads, straight from the deals sheet."""
+    for deal in load_deals(path):
+        yield {
+            'deal_id': deal['Deal ID'],
+            'device_name': str(deal.get('OEM and Device') or '').strip() or None,
+            'contract_term': int(deal['Contract Term']),
+            'price_plan': deal['Price Plan'],
+            'monthly_price_incl_vat': float(deal.get('Total Subscription Incl Vat') or 0),
+            'device_payment_incl_vat': float(deal.get('Once-off Pay-in (incl VAT)') or 0),
+            'total_data': deal.get('Total Data'),
+            'total_minutes': deal.get('Total Minutes'),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cheapest MTN deal for a device and contract term')
+    parser.add_argument('device', nargs='?', help='device name as in the sheet (OEM and Device)')
+    parser.add_argument('--term', type=int, default=24, help='contract term in months (default: 24)')
+    parser.add_argument('--min-data', type=float, default=0, help='at least this many GB')
+    parser.add_argument('--min-minutes', type=int, default=0, help='at least this many anytime minutes')
+    parser.add_argument('--max-once-off', type=float, help='once-off pay-in incl VAT up to')
+    parser.add_argument('--file', type=Path, help='read frontiers from a --build JSON file instead of Supabase')
+    parser.add_argument('--build', type=Path, metavar='OUT', help='build frontiers from --input into a JSON file')
+    parser.add_argument('--input', type=Path, default=DEALS_JSON,
+                        help='Deals workbook (.xlsx), JSON from excel-to-json.py, or .jsonl (for --build)')
+    args = parser.parse_args()
+
+    if args.build:
+        if not args.input.exists():
+            sys.exit(f"ERROR: {args.input} not found")
+        started = time.perf_counter()
+        frontiers = build_frontiers(_records_from_sheet(args.input))
+        write_frontiers(frontiers, args.build, Path(args.input).stem.replace(' - Deals', ''))
+        kept = sum(len(f) for f in frontiers.values())
+        print(f"✓ {len(frontiers):,} device/term frontiers, {kept:,} deals kept → {args.build} "
+              f"({time.perf_counter() - started:.2f}s)")
+        return
+    if not args.device:
+        parser.error('device is required unless --build is given')
+
+    started = time.perf_counter()
+    if args.file:
+        frontier = read_frontiers(args.file).get((args.device, args.term), [])
+    else:
+        from dotenv import load_dotenv
+        from supabase import create_client
+        load_dotenv('.env.local')
+        url, key = os.getenv('NEXT_PUBLIC_SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+        if not url or not key:
+            sys.exit("ERROR: set NEXT_PUBLIC_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY, or use --file")
+        frontier = fetch_frontier(create_client(url, key), args.device, args.term)
+    best = cheapest(frontier, args.min_data, args.min_minutes, args.max_once_off)
+    elapsed = time.perf_counter() - started
+
+    if not frontier:
+        sys.exit(f"No deals for {args.device} on {args.term} months")
+    print(f"{args.device}, {args.term} months: {len(frontier)} Pareto-optimal deals ({elapsed * 1000:.1f} ms)")
+    for e in frontier:
+        mark = '→' if e is best else ' '
+        print(f"  {mark} R{e['monthly']:>9,.2f}/mo  R{e['once_off']:>9,.2f} once-off  "
+              f"{e['data_gb']:>7g} GB  {e['minutes']:>5} min  {e['price_plan']} ({e['deal_id']})")
+    if best is None:
+        print("  No deal meets the constraints")
+
+
+if __name__ == '__main__':
+    main()
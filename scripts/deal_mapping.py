@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Schema-driven mapping of MTN deal sheet rows to mtn_business_deals records.
+
+SCHEMA lists every database column once: the sheet column(s) it comes
+from and how the value is coerced. compile_mapper() turns it into a
+single generated function — one straight-line dict build with the
+coercions inlined, the way dataclasses and namedtuple generate their
+methods — so mapping a row costs no per-column dispatch, and the import
+timestamp and source are bound once per run rather than per row.
+
+Coercions (all matching the original hand-written mapper):
+
+  raw      the cell as-is; the sheet column is required
+  text     stripped string, None for blank cells
+  int      int(); the sheet column is required
+  float    float() of the cell, `default` when the column is absent
+  bool     'Yes' → True, anything else False; real booleans pass through
+  date     ISO date text as excel-to-json.py writes it, None when blank
+  ex_vat   the Ex VAT cell, or Incl VAT / 1.15 when it is 0
+  label    "{Price Plan} + {OEM and Device} ({Contract Term}M)"
+  const    a fixed value
+
+A row that fails to coerce raises MappingError naming the column, and
+the mapper counts failures per column.
+
+Usage:
+  python3 scripts/deal_mapping.py                  # map the deals sheet, report errors
+  python3 scripts/deal_mapping.py deals.jsonl --show 2
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from collections import Counter, namedtuple
+from datetime import datetime
+from pathlib import Path
+
+from mtn_deals import DEALS_JSON, iter_deals
+
+Column = namedtuple('Column', 'name source kind default', defaults=(None,))
+
+SCHEMA = [
+    # Deal identification
+    Column('deal_id', 'Deal ID', 'raw'),
+    Column('deal_name', ('Price Plan', 'OEM and Device', 'Contract Term'), 'label'),
+    # Device information
+    Column('device_name', 'OEM and Device', 'text'),
+    Column('device_status', 'Device Status', 'text'),
+    # Service package
+    Column('price_plan', 'Price Plan', 'raw'),
+    Column('tariff_code', 'Eppix Tariff', 'text'),
+    Column('package_code', 'Eppix Package', 'text'),
+    Column('package_description', 'Package description', 'text'),
+    Column('tariff_description', 'Tariff description', 'text'),
+    # Contract
+    Column('contract_term', 'Contract Term', 'int'),
+    # Pricing
+    Column('monthly_price_incl_vat', 'Total Subscription Incl Vat', 'float', 0),
+    Column('monthly_price_ex_vat', ('Total Subscription Ex Vat', 'Total Subscription Incl Vat'), 'ex_vat'),
+    Column('device_payment_incl_vat', 'Once-off Pay-in (incl VAT)', 'float', 0),
+    # Data & bundles
+    Column('total_data', 'Total Data', 'text'),
+    Column('data_bundle', 'Data Bundle', 'text'),
+    Column('total_minutes', 'Total Minutes', 'text'),
+    Column('anytime_minute_bundle', 'Anytime Minute Bundle', 'text'),
+    Column('onnet_minute_bundle', 'On-Net Minute Bundle', 'text'),
+    Column('sms_bundle', 'SMS Bundle', 'text'),
+    Column('bundle_description', 'Bundle description', 'text'),
+    # Inclusive features
+    Column('inclusive_data', 'Inclusive Price Plan Data', 'text'),
+    Column('inclusive_minutes', 'Inclusive Price Plan Minutes', 'text'),
+    Column('inclusive_sms', 'Inclusive Price Plan SMS', 'text'),
+    Column('inclusive_onnet_minutes', 'Inclusive Price Plan On-net Minutes', 'text'),
+    Column('inclusive_ingroup_calling', 'Inclusive Price Plan In-Group Calling', 'text'),
+    # Freebies (the sheet headers contain a real line break)
+    Column('free_sim', 'Free Sim', 'bool', False),
+    Column('free_cli', 'Free CLI', 'bool', False),
+    Column('free_itb', 'Free ITB', 'bool', False),
+    Column('freebie_devices', 'Freebies description 1\n(Devices)', 'text'),
+    Column('freebie_priceplan', 'Freebie description 2\n(Priceplan)', 'text'),
+    # Availability
+    Column('available_helios', 'Available on Helios', 'bool', True),
+    Column('available_ilula', 'Available on iLula', 'bool', True),
+    Column('channel_visibility', 'Channel Deal Visibility', 'text'),
+    Column('device_range_applicability', 'Device Range Applicability', 'text'),
+    # Inventory
+    Column('inventory_status_main', 'EBU Inventory Status (Main device)', 'text'),
+    Column('inventory_status_freebie', 'EBU Inventory Status (Freebie)', 'text'),
+    # Dates
+    Column('promo_start_date', 'Promo Start date (mm/dd/yyyy)', 'date'),
+    Column('promo_end_date', 'Promo End date (mm/dd/yyyy)', 'date'),
+    # Deals in the current sheet are active; vanished ones are deactivated on import
+    Column('active', None, 'const', True),
+]
+
+# Python expression per coercion; {s} is the source column, {d} the default
+TEMPLATES = {
+    'raw': "deal[{s!r}]",
+    'text': "(str(v).strip() if (v := get({s!r})) else None)",
+    'int': "int(deal[{s!r}])",
+    'float': "float(get({s!r}, {d!r}))",
+    'bool': "(v if (v := get({s!r}, {d!r})).__class__ is bool else str(v).strip().lower() == 'yes')",
+    'date': "(get({s!r}) or None)",
+    'ex_vat': "float(v if (v := get({s[0]!r}, 0)) != 0 else "
+              "(round(i / 1.15, 2) if (i := get({s[1]!r}, 0)) else 0))",
+    'label': "f\"{{deal[{s[0]!r}]}} + {{deal[{s[1]!r}]}} ({{deal[{s[2]!r}]}}M)\"",
+    'const': "{d!r}",
+}
+
+
+class MappingError(ValueError):
+    """A sheet row that could not be coerced; `column` names the culprit."""
+
+    def __init__(self, column, error):
+        if isinstance(error, KeyError):
+            error = f"missing sheet column {error}"
+        super().__init__(f"{column}: {error}")
+        self.column = column
+
+
+def deal_hash(record):
+    """Stable content hash of a mapped deal, ignoring import bookkeeping
+    (metadata, active flag) so only real sheet changes alter it."""
+    content = {k: v for k, v in record.items() if k not in ('metadata', 'active')}
+    payload = json.dumps(content, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def compile_mapper(source, schema=SCHEMA, import_date=None):
+    """Generate map_row(deal) -> record for `schema`.
+
+    The generated function also builds the metadata (import_date is fixed
+    for the whole run) and the content hash; the hash payload is emitted in
+    sorted key order so it equals deal_hash() without sorting per row.
+    Returns (map_row, errors) where errors counts failures per column.
+    """
+    errors = Counter()
+    hashed = sorted(c.name for c in schema if c.name != 'active')
+    lines = ["def map_row(deal):",
+             "    get = deal.get",
+             "    column = None",
+             "    try:"]
+    for i, col in enumerate(schema):
+        expr = TEMPLATES[col.kind].format(s=col.source, d=col.default)
+        lines.append(f"        column = {col.name!r}; c{i} = {expr}")
+    names = {c.name: f"c{i}" for i, c in enumerate(schema)}
+    lines += [
+        "    except Exception as e:",
+        "        errors[column] += 1",
+        "        raise MappingError(column, e) from None",
+        "    payload = dumps({" + ", ".join(f"{n!r}: {names[n]}" for n in hashed) + "})",
+        "    return {",
+        *(f"        {c.name!r}: {names[c.name]}," for c in schema),
+        "        'metadata': {'import_date': import_date, 'source': source, "
+        f"'original_deal_id': {names['deal_id']}, "
+        "'content_hash': blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()},",
+        "    }",
+    ]
+    namespace = {
+        'errors': errors,
+        'MappingError': MappingError,
+        'dumps': json.JSONEncoder(separators=(',', ':'), default=str).encode,
+        'blake2b': hashlib.blake2b,
+        'import_date': import_date or datetime.now().isoformat(),
+        'source': source,
+    }
+    exec('\n'.join(lines), namespace)
+    return namespace['map_row'], errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Map MTN deals to mtn_business_deals records')
+    parser.add_argument('input', nargs='?', type=Path, default=DEALS_JSON,
+                        help='Deals workbook (.xlsx), JSON from excel-to-json.py, or .jsonl')
+    parser.add_argument('--show', type=int, default=0, metavar='N', help='print the first N records')
+    args = parser.parse_args()
+
+    if not args.input.exists():
+        sys.exit(f"ERROR: {args.input} not found")
+    deals = list(iter_deals(args.input))
+    map_row, errors = compile_mapper(args.input.stem.replace(' - Deals', ''))
+    started = time.perf_counter()
+    records = []
+    for deal in deals:
+        try:
+            records.append(map_row(deal))
+        except MappingError:
+            pass
+    elapsed = time.perf_counter() - started
+
+    print(f"Mapped {len(records):,} of {len(deals):,} deals in {elapsed * 1000:.0f} ms "
+          f"({len(deals) / elapsed if elapsed else 0:,.0f} rows/s)")
+    for column, count in errors.most_common():
+        print(f"  {column:28s} {count:,} rows failed")
+    for record in records[:args.show]:
+        print(json.dumps(record, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
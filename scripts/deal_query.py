@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+In-memory query engine over the MTN deal catalogue, for B2B quoting.
+
+The deals are held column by column, with rows ordered by monthly price
+(incl VAT), so row number = price rank. Every filterable attribute has a
+bitmap index, stored as a Python int with one bit per row:
+
+  device, brand (first word of the device), price plan, contract term,
+  Helios / iLula availability   exact-value bitmaps
+  data bundle size              cumulative "at least N GB" bitmaps
+  monthly price                 a bisect on the sorted price column, which
+                                 is a contiguous run of bits
+
+A compound filter such as "24-month, Samsung, ≥20GB, under R800" is a
+handful of big-int ANDs over ~2 KB bitmaps, and matching rows come out
+already sorted cheapest first.
+
+Usage:
+  python3 scripts/deal_query.py --term 24 --brand Samsung --min-data 20 --max-price 800
+  python3 scripts/deal_query.py --device "iPhone 16" --json --limit 5
+  python3 scripts/deal_query.py --serve 8765      # GET /deals?term=24&brand=Samsung&max_price=800
+"""
+
+import argparse
+import bisect
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from deal_snapshot import load_deals
+from mtn_deals import DEALS_JSON, parse_data_gb, parse_minutes
+
+COLUMNS = ('deal_id', 'device', 'price_plan', 'contract_term', 'monthly', 'once_off',
+           'total_data', 'data_gb', 'minutes', 'helios', 'ilula')
+
+
+def _yes(value):
+    return str(value).strip().lower() == 'yes'
+
+
+def _bits(mask):
+    """Row numbers of the set bits, lowest (cheapest) first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class DealCatalogue:
+    """Columnar deal store with bitmap indexes."""
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda r: (r['monthly'], r['once_off'], r['deal_id']))
+        self.n = len(rows)
+        self.all = (1 << self.n) - 1
+        self.cols = {c: [r[c] for r in rows] for c in COLUMNS}
+        self.prices = self.cols['monthly']
+
+        self.by_device = self._index('device')
+        self.by_plan = self._index('price_plan')
+        self.by_term = self._index('contract_term')
+        self.by_brand = self._index('device', key=lambda d: d.split()[0].lower() if d else '')
+        self.helios = self._index('helios').get(True, 0)
+        self.ilula = self._index('ilula').get(True, 0)
+
+        # "At least N GB": cumulative OR from the largest bundle down
+        by_data = self._index('data_gb')
+        self.data_levels = sorted(by_data)
+        self.data_at_least = []
+        acc = 0
+        for gb in reversed(self.data_levels):
+            acc |= by_data[gb]
+            self.data_at_least.append(acc)
+        self.data_at_least.reverse()
+
+    @classmethod
+    def from_deals(cls, deals):
+        """Build from deal dicts as excel-to-json.py / iter_deals() yield them."""
+        return cls({
+            'deal_id': str(d['Deal ID']),
+            'device': str(d.get('OEM and Device') or ''),
+            'price_plan': str(d.get('Price Plan') or ''),
+            'contract_term': int(d['Contract Term']),
+            'monthly': float(d.get('Total Subscription Incl Vat') or 0),
+            'once_off': float(d.get('Once-off Pay-in (incl VAT)') or 0),
+            'total_data': str(d.get('Total Data') or ''),
+            'data_gb': parse_data_gb(d.get('Total Data')),
+            'minutes': parse_minutes(d.get('Total Minutes')),
+            'helios': _yes(d.get('Available on Helios', 'Yes')),
+            'ilula': _yes(d.get('Available on iLula', 'Yes')),
+        } for d in deals)
+
+    def _index(self, col, key=None):
+        # Set bits in a bytearray per value, then convert once: OR-ing 1 << i
+        # into a growing int would copy the whole bitmap for every row
+        rows = {}
+        for i, v in enumerate(self.cols[col]):
+            rows.setdefault(key(v) if key else v, []).append(i)
+        index = {}
+        for k, positions in rows.items():
+            bits = bytearray((self.n + 7) // 8)
+            for i in positions:
+                bits[i >> 3] |= 1 << (i & 7)
+            index[k] = int.from_bytes(bits, 'little')
+        return index
+
+    def _price_range(self, min_price=None, max_price=None):
+        lo = bisect.bisect_left(self.prices, min_price) if min_price is not None else 0
+        hi = bisect.bisect_right(self.prices, max_price) if max_price is not None else self.n
+        return ((1 << hi) - 1) ^ ((1 << lo) - 1) if hi > lo else 0
+
+    def _match(self, index, value, substring=False):
+        if not substring:
+            return index.get(value, 0)
+        needle = str(value).lower()
+        mask = 0
+        for k, bits in index.items():
+            if needle in str(k).lower():
+                mask |= bits
+        return mask
+
+    def mask(self, term=None, device=None, brand=None, plan=None, min_data_gb=None,
+             min_price=None, max_price=None, helios=None, ilula=None):
+        """Bitmap of rows matching every given filter.
+
+        device and plan match case-insensitive substrings; brand the first
+        word of the device name.
+        """
+        m = self.all
+        if min_price is not None or max_price is not None:
+            m &= self._price_range(min_price, max_price)
+        if term is not None:
+            m &= self.by_term.get(int(term), 0)
+        if brand:
+            m &= self.by_brand.get(brand.lower(), 0)
+        if device:
+            m &= self._match(self.by_device, device, substring=True)
+        if plan:
+            m &= self._match(self.by_plan, plan, substring=True)
+        if min_data_gb is not None:
+            i = bisect.bisect_left(self.data_levels, min_data_gb)
+            m &= self.data_at_least[i] if i < len(self.data_at_least) else 0
+        if helios is not None:
+            m &= self.helios if helios else self.all ^ self.helios
+        if ilula is not None:
+            m &= self.ilula if ilula else self.all ^ self.ilula
+        return m
+
+    def row(self, i):
+        return {c: self.cols[c][i] for c in COLUMNS}
+
+    def query(self, limit=20, **filters):
+        """Matching deals as dicts, cheapest monthly price first."""
+        out = []
+        for i in _bits(self.mask(**filters)):
+            out.append(self.row(i))
+            if limit and len(out) >= limit:
+                break
+        return out
+
+    def count(self, **filters):
+        return bin(self.mask(**filters)).count('1')
+
+
+# query-string / CLI name → (mask keyword, type)
+FILTERS = {
+    'term': ('term', int),
+    'device': ('device', str),
+    'brand': ('brand', str),
+    'plan': ('plan', str),
+    'min_data': ('min_data_gb', float),
+    'min_price': ('min_price', float),
+    'max_price': ('max_price', float),
+    'helios': ('helios', _yes),
+    'ilula': ('ilula', _yes),
+}
+
+
+def serve(catalogue, port):
+    """Minimal JSON endpoint for the quoting flow: GET /deals?term=24&brand=Samsung&limit=10"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/deals':
+                self.send_error(404)
+                return
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            try:
+                filters = {FILTERS[k][0]: FILTERS[k][1](v) for k, v in params.items() if k in FILTERS}
+                limit = int(params.get('limit', 20))
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+            started = time.perf_counter()
+            deals = catalogue.query(limit=limit, **filters)
+            body = json.dumps({
+                'count': catalogue.count(**filters),
+                'deals': deals,
+                'elapsed_us': round((time.perf_counter() - started) * 1e6, 1),
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    print(f"Serving {catalogue.n:,} deals on http://127.0.0.1:{port}/deals")
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the MTN deal catalogue')
+    parser.add_argument('--input', type=Path, default=DEALS_JSON,
+                        help='Deals workbook (.xlsx), JSON from excel-to-json.py, or .jsonl')
+    parser.add_argument('--term', type=int, help='contract term in months')
+    parser.add_argument('--device', help='device name contains')
+    parser.add_argument('--brand', help='device brand (first word, e.g. Samsung)')
+    parser.add_argument('--plan', help='price plan contains')
+    parser.add_argument('--min-data', type=float, help='at least this many GB')
+    parser.add_argument('--min-price', type=float, help='monthly price incl VAT from')
+    parser.add_argument('--max-price', type=float, help='monthly price incl VAT up to')
+    parser.add_argument('--helios', action='store_true', help='only deals available on Helios')
+    parser.add_argument('--ilula', action='store_true', help='only deals available on iLula')
+    parser.add_argument('--limit', type=int, default=20, help='rows to show (default: 20, 0 for all)')
+    parser.add_argument('--json', action='store_true', help='print matching deals as JSON')
+    parser.add_argument('--serve', type=int, metavar='PORT', help='serve GET /deals on localhost')
+    args = parser.parse_args()
+
+    if not args.input.exists():
+        sys.exit(f"ERROR: {args.input} not found")
+    started = time.perf_counter()
+    catalogue = DealCatalogue.from_deals(load_deals(args.input))
+    loaded = time.perf_counter() - started
+
+    if args.serve:
+        serve(catalogue, args.serve)
+        return
+
+    filters = {
+        'term': args.term, 'device': args.device, 'brand': args.brand, 'plan': args.plan,
+        'min_data_gb': args.min_data, 'min_price': args.min_price, 'max_price': args.max_price,
+        'helios': True if args.helios else None, 'ilula': True if args.ilula else None,
+    }
+    started = time.perf_counter()
+    deals = catalogue.query(limit=args.limit, **filters)
+    elapsed = time.perf_counter() - started
+    total = catalogue.count(**filters)
+
+    if args.json:
+        print(json.dumps(deals, indent=2))
+        return
+    print(f"Loaded {catalogue.n:,} deals in {loaded:.2f}s; "
+          f"{total:,} match, query took {elapsed * 1e6:.0f} µs")
+    for d in deals:
+        print(f"  R{d['monthly']:>9,.2f}/mo  R{d['once_off']:>9,.2f} once-off  {d['contract_term']:>2}M  "
+              f"{d['total_data'][:18]:18s} {d['device'][:34]:34s} {d['price_plan']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Arrow IPC snapshot of the MTN deal catalogue.
+
+Parsing the ~30 MB deals JSON (or the workbook) takes a good fraction of a
+second on every run of every deals script. The first load writes the
+deals as an Arrow IPC file next to the source ("<source name>.arrow");
+later loads memory-map it, so columns are read zero-copy and only the
+ones a tool asks for are touched.
+
+The snapshot records the source's size, mtime and SHA-256. It is reused
+while size and mtime match, or when only the mtime moved but the content
+hash still matches (a fresh checkout); the new mtime is then recorded so
+later loads skip the hash. It is rebuilt otherwise.
+
+Columns are typed from the sheet: text as strings, whole-number columns
+as int64, other numeric columns as float64, with blank cells stored as
+nulls and handed back as '' exactly as excel-to-json.py writes them;
+columns mixing text and numbers are kept as JSON-encoded strings, so
+rows read back from a snapshot equal the rows iter_deals() yields.
+
+pyarrow is optional (pip install pyarrow). Without it, or when the
+snapshot cannot be written, load_deals() streams the source as before.
+
+Usage:
+  python3 scripts/deal_snapshot.py                # build or refresh, then time both load paths
+  python3 scripts/deal_snapshot.py deals.xlsx --force
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from mtn_deals import DEALS_JSON, SHEET, iter_deals
+
+SUFFIX = '.arrow'
+BATCH = 4096
+
+
+def snapshot_path(source):
+    source = Path(source)
+    return source.with_name(source.name + SUFFIX)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _column(pa, values):
+    """(Arrow array, encoding) for one sheet column; blanks become nulls."""
+    kinds = {type(v) for v in values if v != ''}
+    if kinds <= {str}:
+        return pa.array(values, pa.string()), 'text'
+    if kinds <= {int}:
+        return pa.array([None if v == '' else v for v in values], pa.int64()), 'number'
+    if kinds <= {int, float}:
+        return pa.array([None if v == '' else v for v in values], pa.float64()), 'number'
+    if kinds <= {bool}:
+        return pa.array([None if v == '' else v for v in values], pa.bool_()), 'number'
+    return pa.array([json.dumps(v) for v in values], pa.string()), 'json'
+
+
+def build_table(deals, metadata=None):
+    """Column-typed pyarrow.Table of deal dicts (columns in first-seen order)."""
+    import pyarrow as pa
+    columns = {}
+    n = 0
+    for deal in deals:
+        for key, value in deal.items():
+            if key not in columns:
+                columns[key] = [''] * n
+            columns[key].append(value)
+        n += 1
+        for values in columns.values():
+            if len(values) < n:
+                values.append('')
+    arrays, fields = [], []
+    for name, values in columns.items():
+        array, encoding = _column(pa, values)
+        arrays.append(array)
+        fields.append(pa.field(name, array.type, metadata={'encoding': encoding}))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields, metadata=metadata))
+
+
+def _fingerprint(source):
+    st = os.stat(source)
+    return {'source': Path(source).name, 'size': str(st.st_size), 'mtime_ns': str(st.st_mtime_ns)}
+
+
+def is_fresh(source, snapshot, sheet=SHEET):
+    """True when `snapshot` was built from the current contents of `source`."""
+    import pyarrow as pa
+    try:
+        with pa.memory_map(str(snapshot)) as f:
+            meta = {k.decode(): v.decode() for k, v in (pa.ipc.open_file(f).schema.metadata or {}).items()}
+    except (OSError, pa.ArrowInvalid):
+        return False
+    current = _fingerprint(source)
+    if meta.get('sheet') != sheet or meta.get('source') != current['source'] or meta.get('size') != current['size']:
+        return False
+    if meta.get('mtime_ns') == current['mtime_ns']:
+        return True
+    if meta.get('sha256') != file_sha256(source):
+        return False
+    # Same content under a new mtime (checkout, touch, copy): record it so
+    # later loads take the mtime shortcut instead of hashing the source again
+    try:
+        with pa.memory_map(str(snapshot)) as f:
+            table = pa.ipc.open_file(f).read_all()
+        _write(table.replace_schema_metadata({**meta, 'mtime_ns': current['mtime_ns']}), Path(snapshot))
+    except (OSError, pa.ArrowInvalid):
+        pass
+    return True
+
+
+def _write(table, path):
+    import pyarrow as pa
+    tmp = path.with_name(path.name + '.tmp')
+    try:
+        with pa.OSFile(str(tmp), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=BATCH)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def write_snapshot(source, sheet=SHEET, path=None):
+    """Parse `source` and write its snapshot; returns (path, table)."""
+    path = Path(path or snapshot_path(source))
+    metadata = {**_fingerprint(source), 'sha256': file_sha256(source), 'sheet': sheet}
+    table = build_table(iter_deals(source, sheet), metadata)
+    _write(table, path)
+    return path, table
+
+
+def load_table(source=DEALS_JSON, sheet=SHEET, columns=None, refresh=True):
+    """The deals as a pyarrow.Table, memory-mapped from the snapshot
+    (rebuilt first if stale), or None when pyarrow is not installed.
+
+    `columns` limits the table to those sheet columns.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+    path = snapshot_path(source)
+    if not (path.exists() and is_fresh(source, path, sheet)):
+        if not refresh:
+            return None
+        try:
+            path, table = write_snapshot(source, sheet)
+        except OSError as e:
+            print(f"[WARN] Could not write deal snapshot {path} ({e}); using the parsed source")
+            table = build_table(iter_deals(source, sheet))
+        return table.select(columns) if columns else table
+    table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+    return table.select(columns) if columns else table
+
+
+def column_values(table, name):
+    """A table column as Python values, decoded back to sheet cells."""
+    field = table.schema.field(name)
+    values = table.column(name).to_pylist()
+    encoding = (field.metadata or {}).get(b'encoding', b'text')
+    if encoding == b'number':
+        return ['' if v is None else v for v in values]
+    if encoding == b'json':
+        return [json.loads(v) for v in values]
+    return values
+
+
+def iter_table_deals(table):
+    """Yield deal dicts from a snapshot table."""
+    names = table.column_names
+    for start in range(0, table.num_rows, BATCH):
+        batch = table.slice(start, BATCH)
+        for row in zip(*(column_values(batch, name) for name in names)):
+            yield dict(zip(names, row))
+
+
+def load_deals(source=DEALS_JSON, sheet=SHEET):
+    """Deal dicts from the snapshot when pyarrow is available, else
+    streamed from the source by iter_deals()."""
+    table = load_table(source, sheet)
+    if table is None:
+        return iter_deals(source, sheet)
+    return iter_table_deals(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build / refresh the Arrow snapshot of the MTN deals')
+    parser.add_argument('input', nargs='?', type=Path, default=DEALS_JSON,
+                        help='Deals workbook (.xlsx), JSON from excel-to-json.py, or .jsonl')
+    parser.add_argument('--sheet', default=SHEET, help=f'sheet name (default: {SHEET})')
+    parser.add_argument('--force', action='store_true', help='rebuild even if the snapshot is fresh')
+    args = parser.parse_args()
+
+    if not args.input.exists():
+        sys.exit(f"ERROR: {args.input} not found")
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        sys.exit("ERROR: pyarrow is not installed (pip install pyarrow)")
+
+    path = snapshot_path(args.input)
+    started = time.perf_counter()
+    if args.force or not (path.exists() and is_fresh(args.input, path, args.sheet)):
+        path, table = write_snapshot(args.input, args.sheet)
+        print(f"✓ Wrote {table.num_rows:,} deals → {path} "
+              f"({path.stat().st_size / 1e6:.1f} MB, {time.perf_counter() - started:.2f}s)")
+    else:
+        print(f"✓ {path} is up to date")
+
+    started = time.perf_counter()
+    n = sum(1 for _ in iter_deals(args.input, args.sheet))
+    parsed = time.perf_counter() - started
+    started = time.perf_counter()
+    table = load_table(args.input, args.sheet)
+    mapped = time.perf_counter() - started
+    started = time.perf_counter()
+    rows = sum(1 for _ in iter_table_deals(table))
+    as_dicts = time.perf_counter() - started
+    print(f"\nParse source:      {n:,} deals in {parsed * 1000:8.1f} ms")
+    print(f"Map snapshot:      {table.num_rows:,} deals in {mapped * 1000:8.1f} ms")
+    print(f"  + rows as dicts: {rows:,} deals in {as_dicts * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
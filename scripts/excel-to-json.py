@@ -1,86 +1,172 @@
 #!/usr/bin/env python3
-"""Convert Excel workbook to JSON format"""
+"""Convert Excel workbook to JSON format
 
-import pandas as pd
+Sheets are read with the Rust-backed calamine engine when python-calamine
+is installed (pip install python-calamine, pandas >= 2.2), falling back to
+openpyxl, and multi-sheet workbooks are read in parallel processes. Date
+columns are formatted in one vectorised pass.
+
+Output formats:
+  json     indented, the original layout (default)
+  compact  the same structure without whitespace, streamed sheet by sheet
+  jsonl    one row per line; one file per sheet for multi-sheet workbooks
+
+Usage:
+  python excel-to-json.py <excel_file> [output] [--format compact] [--engine calamine]
+"""
+
+import argparse
 import json
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
 from pathlib import Path
-from datetime import datetime
+
 import numpy as np
+import pandas as pd
+
+
+def default_engine():
+    """calamine when available, else openpyxl"""
+    try:
+        import python_calamine  # noqa: F401
+        return 'calamine'
+    except ImportError:
+        return 'openpyxl'
+
+
+def json_default(value):
+    """Dates that survive in mixed object columns, and stray NumPy scalars"""
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def read_sheet(excel_path, sheet_name, engine):
+    """Read one sheet into (sheet_name, columns, records)"""
+    df = pd.read_excel(excel_path, sheet_name=sheet_name, engine=engine)
+
+    # Format datetime columns before filling blanks, so NaT becomes ''
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime('%Y-%m-%d')
+    df = df.fillna('')
+
+    return sheet_name, list(df.columns), df.to_dict('records')
+
+
+def read_workbook(excel_path, engine=None, workers=None):
+    """Read every sheet, in parallel processes when there are several"""
+    engine = engine or default_engine()
+    sheet_names = pd.ExcelFile(excel_path, engine=engine).sheet_names
+    workers = min(workers or os.cpu_count() or 1, len(sheet_names))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            sheets = list(pool.map(read_sheet, [excel_path] * len(sheet_names),
+                                   sheet_names, [engine] * len(sheet_names)))
+    else:
+        sheets = [read_sheet(excel_path, name, engine) for name in sheet_names]
+    return sheet_names, sheets, engine
+
 
-def excel_to_json(excel_path, output_path=None):
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=json_default)
+
+
+def write_json(output_path, filename, sheet_names, sheets, compact=False):
+    """Write the {filename, sheets, data} document"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        if not compact:
+            output = {
+                'filename': filename,
+                'sheets': sheet_names,
+                'data': {
+                    name: {'rows': len(records), 'columns': columns, 'data': records}
+                    for name, columns, records in sheets
+                }
+            }
+            json.dump(output, f, indent=2, ensure_ascii=False, default=json_default)
+            return [output_path]
+
+        # Stream row by row rather than building one huge string
+        f.write(f'{{"filename":{_dumps(filename)},"sheets":{_dumps(sheet_names)},"data":{{')
+        for i, (name, columns, records) in enumerate(sheets):
+            f.write(f'{"," if i else ""}{_dumps(name)}:'
+                    f'{{"rows":{len(records)},"columns":{_dumps(columns)},"data":[')
+            for j, record in enumerate(records):
+                f.write(('\n,' if j else '\n') + _dumps(record))
+            f.write(']}')
+        f.write('}}\n')
+    return [output_path]
+
+
+def write_jsonl(output_path, sheets):
+    """One row per line; a file per sheet when there are several"""
+    output_path = Path(output_path)
+    paths = []
+    for name, columns, records in sheets:
+        path = output_path if len(sheets) == 1 else output_path.with_name(
+            f"{output_path.stem}.{name}{output_path.suffix}")
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(_dumps(record) + '\n')
+        paths.append(path)
+    return paths
+
+
+def excel_to_json(excel_path, output_path=None, fmt='json', engine=None, workers=None):
     """Convert Excel file to JSON"""
     try:
-        # Read Excel file
-        xls = pd.ExcelFile(excel_path)
-        
+        started = time.perf_counter()
         print(f"Reading Excel file: {excel_path}")
-        print(f"Found {len(xls.sheet_names)} sheets: {', '.join(xls.sheet_names)}")
+        sheet_names, sheets, engine = read_workbook(excel_path, engine, workers)
+        read_done = time.perf_counter()
+
+        print(f"Found {len(sheet_names)} sheets: {', '.join(sheet_names)} (engine: {engine})")
         print()
-        
-        # Store all sheets data
-        workbook_data = {}
-        
-        # Process each sheet
-        for sheet_name in xls.sheet_names:
-            print(f"Processing sheet: {sheet_name}")
-            df = pd.read_excel(xls, sheet_name=sheet_name)
-            
-            # Show preview
-            print(f"  Rows: {len(df)}, Columns: {len(df.columns)}")
-            print(f"  Columns: {list(df.columns)}")
-            
-            # Convert to records (list of dictionaries)
-            # Handle NaN values and dates
-            df = df.fillna('')
-            
-            # Convert datetime columns to string
-            for col in df.columns:
-                if pd.api.types.is_datetime64_any_dtype(df[col]):
-                    df[col] = df[col].apply(lambda x: x.strftime('%Y-%m-%d') if pd.notna(x) and x != '' else '')
-            
-            records = df.to_dict('records')
-            
-            workbook_data[sheet_name] = {
-                'rows': len(df),
-                'columns': list(df.columns),
-                'data': records
-            }
-            
-            print(f"  Converted {len(records)} rows")
+        for name, columns, records in sheets:
+            print(f"Processing sheet: {name}")
+            print(f"  Rows: {len(records)}, Columns: {len(columns)}")
+            print(f"  Columns: {columns}")
             print()
-        
-        # Create output structure
-        output = {
-            'filename': Path(excel_path).name,
-            'sheets': list(xls.sheet_names),
-            'data': workbook_data
-        }
-        
+
         # Determine output path
         if not output_path:
-            excel_file = Path(excel_path)
-            output_path = excel_file.with_suffix('.json')
-        
-        # Write JSON
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(output, f, indent=2, ensure_ascii=False)
-        
-        print(f"[SUCCESS] Converted to JSON: {output_path}")
-        print(f"Total records: {sum(sheet['rows'] for sheet in workbook_data.values())}")
-        
-        return output_path
-        
+            output_path = Path(excel_path).with_suffix('.jsonl' if fmt == 'jsonl' else '.json')
+
+        if fmt == 'jsonl':
+            paths = write_jsonl(output_path, sheets)
+        else:
+            paths = write_json(output_path, Path(excel_path).name, sheet_names, sheets,
+                               compact=(fmt == 'compact'))
+        done = time.perf_counter()
+
+        size = sum(Path(p).stat().st_size for p in paths)
+        print(f"[SUCCESS] Converted to {fmt.upper()}: {', '.join(str(p) for p in paths)}")
+        print(f"Total records: {sum(len(records) for _, _, records in sheets)}")
+        print(f"Read {read_done - started:.2f}s, write {done - read_done:.2f}s, "
+              f"{size / 1e6:.1f} MB")
+
+        return paths[0] if len(paths) == 1 else paths
+
     except Exception as e:
         print(f"[ERROR] {e}", file=sys.stderr)
         raise
 
+
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Usage: python excel-to-json.py <excel_file> [output_json]")
-        sys.exit(1)
-    
-    excel_path = sys.argv[1]
-    output_path = sys.argv[2] if len(sys.argv) > 2 else None
-    
-    excel_to_json(excel_path, output_path)
+    parser = argparse.ArgumentParser(description='Convert an Excel workbook to JSON / JSONL')
+    parser.add_argument('excel_file')
+    parser.add_argument('output', nargs='?', help='output path (default: next to the workbook)')
+    parser.add_argument('--format', choices=['json', 'compact', 'jsonl'], default='json',
+                        help='json (indented, default), compact (no whitespace) or jsonl (one row per line)')
+    parser.add_argument('--engine', choices=['calamine', 'openpyxl'],
+                        help='pandas Excel engine (default: calamine if installed, else openpyxl)')
+    parser.add_argument('--workers', type=int, help='processes for multi-sheet workbooks (default: CPU count)')
+    args = parser.parse_args()
+
+    excel_to_json(args.excel_file, args.output, args.format, args.engine, args.workers)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+SQLite-backed geocode cache used by geocode_to_kml.py.
+
+Every lookup is stored as its own row (address → lat/lng, raw API status,
+precision tag, fetch time) and committed immediately, so a crash mid-run
+keeps everything fetched so far. Entries expire after `ttl_days`; cached
+failures (ZERO_RESULTS, legacy misses) expire after the much shorter
+`negative_ttl_days`, so an address the API did not know is retried on a
+later run instead of becoming a permanent miss. Transient API errors are
+never stored (see geocode() in geocode_to_kml.py).
+
+The database runs in WAL mode and each thread gets its own connection, so
+the geocoding worker pool can read and write concurrently.
+
+Usage (inspection):
+  python3 scripts/geocode_cache.py [cache.sqlite]          # summary by status
+  python3 scripts/geocode_cache.py [cache.sqlite] --purge  # drop expired rows
+"""
+
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+DAY = 86400.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocode (
+    address    TEXT PRIMARY KEY,
+    lat        REAL,
+    lng        REAL,
+    status     TEXT NOT NULL,
+    precision  TEXT,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_geocode_status_fetched ON geocode(status, fetched_at);
+"""
+
+
+class GeocodeCache:
+    """Mapping-like view of the cache: `key in cache`, `cache.get(key)`.
+
+    Expired rows behave as missing. Writes go through `put()`, which needs
+    the raw API status alongside the coordinates.
+    """
+
+    def __init__(self, path, ttl_days=365, negative_ttl_days=7):
+        self.path = str(path)
+        self.ttl = ttl_days * DAY
+        self.negative_ttl = negative_ttl_days * DAY
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(geocode)")}
+        if "precision" not in columns:  # caches created before precision tags
+            conn.execute("ALTER TABLE geocode ADD COLUMN precision TEXT")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: autocommit, each put() is durable on return.
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _fresh(self, status, fetched_at, now):
+        ttl = self.ttl if status == "OK" else self.negative_ttl
+        return now - fetched_at < ttl
+
+    def lookup(self, key):
+        """Return (hit, coords, precision); coords is None for a cached failure."""
+        row = self._conn().execute(
+            "SELECT lat, lng, status, precision, fetched_at FROM geocode WHERE address = ?", (key,)
+        ).fetchone()
+        if row is None or not self._fresh(row[2], row[4], time.time()):
+            return False, None, None
+        if row[2] != "OK":
+            return True, None, None
+        return True, (row[0], row[1]), row[3]
+
+    def __contains__(self, key):
+        return self.lookup(key)[0]
+
+    def get(self, key, default=None):
+        hit, coords, _ = self.lookup(key)
+        return coords if hit else default
+
+    def put(self, key, coords, status, precision=None, fetched_at=None):
+        lat, lng = coords if coords is not None else (None, None)
+        self._conn().execute(
+            "INSERT OR REPLACE INTO geocode (address, lat, lng, status, precision, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, lat, lng, status, precision, time.time() if fetched_at is None else fetched_at),
+        )
+
+    def iter_ok(self):
+        """Yield (address, lat, lng, precision) for every successful lookup, fresh or not."""
+        yield from self._conn().execute(
+            "SELECT address, lat, lng, precision FROM geocode WHERE status = 'OK'")
+
+    def import_entries(self, entries):
+        """Bulk-load (address, coords) pairs from the legacy JSON cache.
+
+        Successful lookups are stamped now; legacy failures carry no status
+        or date, so they are stamped as already expired and get retried.
+        """
+        now = time.time()
+        rows = [
+            (key, *(coords or (None, None)),
+             "OK" if coords else "LEGACY_FAILURE",
+             now if coords else 0.0)
+            for key, coords in entries
+        ]
+        conn = self._conn()
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT OR IGNORE INTO geocode (address, lat, lng, status, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?)", rows)
+        conn.execute("COMMIT")
+        return len(rows)
+
+    def purge_expired(self):
+        now = time.time()
+        cur = self._conn().execute(
+            "DELETE FROM geocode WHERE (status = 'OK' AND fetched_at < ?) "
+            "OR (status != 'OK' AND fetched_at < ?)",
+            (now - self.ttl, now - self.negative_ttl),
+        )
+        return cur.rowcount
+
+    def stats(self):
+        return dict(self._conn().execute(
+            "SELECT status, COUNT(*) FROM geocode GROUP BY status ORDER BY 2 DESC"
+        ).fetchall())
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    path = Path(args[0]) if args else Path("/home/circletel/contracts_geocode_cache.sqlite")
+    cache = GeocodeCache(path)
+    if "--purge" in sys.argv:
+        print(f"Purged {cache.purge_expired()} expired entries")
+    print(f"{path}: {len(cache)} entries")
+    for status, n in cache.stats().items():
+        print(f"  {status:16s} {n:>7,}")
+
+
+if __name__ == "__main__":
+    main()
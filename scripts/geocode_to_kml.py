@@ -3,8 +3,29 @@
 Geocode clean contract addresses and produce a KML file for Google Earth.
 
 Reads:   contracts_clean_addresses.json
-Writes:  contracts_map.kml
-Cache:   contracts_geocode_cache.json  (avoids re-calling the API)
+Writes:  contracts_map.kml  (or contracts_map.kmz with --kmz), streamed
+         via kml_writer.py so memory stays flat as the customer base
+         grows; with --lod, a clustered level-of-detail tree
+         (contracts_map_lod/ or contracts_map_lod.kmz) built by kml_lod.py
+Cache:   contracts_geocode_cache.sqlite  (avoids re-calling the API; see
+         geocode_cache.py — the older contracts_geocode_cache.json is
+         imported into it on first run)
+
+Addresses are normalised (case, spacing, punctuation, repeated
+fragments) before lookup, so customers at the same location share one
+cache entry and one API call. Cache hits are resolved up front without
+touching the network; only misses go through a pool of worker threads
+that share a token-bucket rate limiter and keep their HTTPS connections
+alive between requests.
+
+With --gazetteer first|fallback|only, addresses are also resolved
+offline from their postal code / suburb (postcode_gazetteer.py). Every
+coordinate carries a precision tag (rooftop, street, area, approximate
+from the API; suburb or postal_code from the gazetteer) shown in its
+placemark.
+
+With --index, the mapped customers are also written to the spatial
+index queried by customer_index.py (radius / nearest-N searches).
 
 Price-tier colours (KML AABBGGRR format):
   < R300   → green  ff00aa00
@@ -14,23 +35,54 @@ Price-tier colours (KML AABBGGRR format):
   Unknown  → grey   ff888888
 """
 
+import argparse
+import http.client
 import json
 import os
 import re
 import sys
+import threading
 import time
-import urllib.request
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+from geocode_cache import GeocodeCache
+from customer_index import INDEX, CustomerIndex
+from kml_lod import write_lod
+from kml_writer import KmlWriter
+from postcode_gazetteer import GAZETTEER, Gazetteer
+
 BASE = Path("/home/circletel")
 INPUT  = BASE / "data/exports/contracts/contracts_clean_addresses.json"
 OUTPUT = BASE / "contracts_map.kml"
-CACHE  = BASE / "contracts_geocode_cache.json"
+LOD_OUTPUT = BASE / "contracts_map_lod"
+CACHE  = BASE / "contracts_geocode_cache.sqlite"
+LEGACY_CACHE = BASE / "contracts_geocode_cache.json"
 
 API_KEY = os.environ.get("GOOGLE_MAPS_SERVER_KEY", "")
-if not API_KEY:
-    sys.exit("ERROR: GOOGLE_MAPS_SERVER_KEY not set. Run: set -a && source .env.local && set +a && python3 scripts/geocode_to_kml.py")
+
+GEOCODE_HOST = "maps.googleapis.com"
+GEOCODE_PATH = "/maps/api/geocode/json"
+
+# Geocoding API allows 50 req/s; stay a little under it by default.
+DEFAULT_RATE = 40.0
+DEFAULT_WORKERS = 8
+
+# Google location_type → precision tag stored with each coordinate.
+API_PRECISION = {
+    "ROOFTOP": "rooftop",
+    "RANGE_INTERPOLATED": "street",
+    "GEOMETRIC_CENTER": "area",
+    "APPROXIMATE": "approximate",
+}
+
+# Cache expiry: successful lookups are stable; an address the API does not
+# know is re-checked after the shorter negative TTL. Other failures (quota,
+# key, server or network errors) are never cached.
+DEFAULT_TTL_DAYS = 365
+DEFAULT_NEGATIVE_TTL_DAYS = 7
+CACHEABLE_FAILURES = {"ZERO_RESULTS"}
 
 # ── price tiers ───────────────────────────────────────────────────────────────
 TIERS = [
@@ -41,14 +93,20 @@ TIERS = [
     ("Unknown",     "ff888888"),   # grey
 ]
 
-def tier_for(fee):
-    """Return (tier_name, style_id) for a monthly_fee string."""
+def fee_value(fee):
+    """Parse a monthly_fee string ("R 1,299.00") to a float, or None."""
     if not fee:
-        return "Unknown", "sUnknown"
+        return None
     m = re.search(r"[\d,]+\.?\d*", fee.replace(" ", ""))
     if not m:
+        return None
+    return float(m.group().replace(",", ""))
+
+def tier_for(fee):
+    """Return (tier_name, style_id) for a monthly_fee string."""
+    val = fee_value(fee)
+    if val is None:
         return "Unknown", "sUnknown"
-    val = float(m.group().replace(",", ""))
     if val < 300:
         return "Under R300",  "sGreen"
     if val < 500:
@@ -65,31 +123,156 @@ STYLE_IDS = {
     "sUnknown": "ff888888",
 }
 
+# ── address normalisation ─────────────────────────────────────────────────────
+_WS_RE = re.compile(r"\s+")
+_COMMA_RE = re.compile(r"\s*,\s*")
+
+def normalize_address(address):
+    """Canonical cache key for an address.
+
+    Folds case and whitespace, strips stray punctuation around comma-separated
+    parts, drops empty and repeated parts (e.g. a suburb listed twice) and a
+    trailing "South Africa", which the geocoder appends itself.
+    """
+    s = _WS_RE.sub(" ", str(address or "")).strip().casefold()
+    parts = []
+    for part in _COMMA_RE.split(s):
+        part = part.strip(" .;")
+        if part and part not in parts:
+            parts.append(part)
+    if parts and parts[-1] in ("south africa", "za", "rsa"):
+        parts.pop()
+    return ", ".join(parts)
+
+def group_by_address(records):
+    """Group records by normalised address; records without one are left out."""
+    groups = {}
+    for rec in records:
+        key = normalize_address(rec.get("physical_address"))
+        if key:
+            groups.setdefault(key, []).append(rec)
+    return groups
+
+def normalize_cache(cache):
+    """Re-key a legacy JSON cache, keeping a hit over a failure on collisions."""
+    out = {}
+    for addr, coords in cache.items():
+        key = normalize_address(addr)
+        if key and (key not in out or out[key] is None):
+            out[key] = tuple(coords) if coords else None
+    return out
+
 # ── geocoding ─────────────────────────────────────────────────────────────────
-def geocode(address, cache):
-    key = address.strip()
-    if key in cache:
-        return cache[key]
-
-    query = key + ", South Africa"
-    url = (
-        "https://maps.googleapis.com/maps/api/geocode/json?"
-        + urllib.parse.urlencode({"address": query, "key": API_KEY})
-    )
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens/s, holding at most `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate / 4))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+_local = threading.local()
+
+def _connection():
+    """Per-thread keep-alive HTTPS connection to the Geocoding API."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = http.client.HTTPSConnection(GEOCODE_HOST, timeout=10)
+        _local.conn = conn
+    return conn
+
+def _drop_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+def _request(query):
+    path = GEOCODE_PATH + "?" + urllib.parse.urlencode({"address": query, "key": API_KEY})
+    # One retry on a fresh socket: the server may have closed an idle keep-alive connection.
+    for attempt in (1, 2):
+        conn = _connection()
+        try:
+            conn.request("GET", path, headers={"Connection": "keep-alive"})
+            resp = conn.getresponse()
+            body = resp.read()
+            if resp.status != 200:
+                raise RuntimeError(f"HTTP {resp.status}")
+            return json.loads(body)
+        except (http.client.HTTPException, OSError):
+            _drop_connection()
+            if attempt == 2:
+                raise
+
+def geocode(address, cache, limiter=None):
+    key = normalize_address(address)
+    hit, coords, _ = cache.lookup(key)
+    if hit:
+        return coords
+
+    if limiter is not None:
+        limiter.acquire()
     try:
-        with urllib.request.urlopen(url, timeout=10) as resp:
-            data = json.loads(resp.read())
-        if data.get("status") == "OK":
-            loc = data["results"][0]["geometry"]["location"]
-            result = (loc["lat"], loc["lng"])
-        else:
-            result = None
+        data = _request(key + ", South Africa")
     except Exception as e:
         print(f"  [geocode error] {e}", file=sys.stderr)
-        result = None
+        return None
 
-    cache[key] = result
-    return result
+    status = data.get("status", "UNKNOWN_ERROR")
+    if status == "OK":
+        geometry = data["results"][0]["geometry"]
+        loc = geometry["location"]
+        result = (loc["lat"], loc["lng"])
+        cache.put(key, result, status,
+                  API_PRECISION.get(geometry.get("location_type"), "approximate"))
+        return result
+    if status in CACHEABLE_FAILURES:
+        cache.put(key, None, status)
+    else:
+        # Quota, key and server errors say nothing about the address: leave
+        # it uncached so the next run asks again
+        print(f"  [geocode {status}] {key}", file=sys.stderr)
+    return None
+
+def geocode_all(addresses, cache, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE):
+    """Fill the GeocodeCache for every address; returns (hits, misses) counts.
+
+    Cache hits never touch the limiter. Misses are deduplicated and fetched
+    by `workers` threads that share one token bucket.
+    """
+    unique = list(dict.fromkeys(normalize_address(a) for a in addresses))
+    misses = [k for k in unique if k not in cache]
+    hits = len(unique) - len(misses)
+    if not misses:
+        return hits, 0
+
+    print(f"Geocoding {len(misses)} uncached addresses "
+          f"({workers} workers, {rate:g} req/s)...")
+    limiter = TokenBucket(rate)
+    done = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(geocode, k, cache, limiter) for k in misses]
+        for fut in as_completed(futures):
+            done += 1
+            if fut.result() is None:
+                failed += 1
+            if done % 50 == 0 or done == len(misses):
+                print(f"  [{done}/{len(misses)}] failed={failed}")
+    return hits, len(misses)
 
 # ── KML helpers ───────────────────────────────────────────────────────────────
 def xml_escape(s):
@@ -112,7 +295,7 @@ def make_styles():
   </Style>""")
     return "\n".join(lines)
 
-def make_placemark(rec, lat, lng):
+def make_placemark(rec, lat, lng, precision=None):
     tier_name, style_id = tier_for(rec.get("monthly_fee"))
     name = xml_escape(rec.get("account_number") or rec.get("source_filename", ""))
     addr = xml_escape(rec.get("physical_address", ""))
@@ -125,7 +308,8 @@ def make_placemark(rec, lat, lng):
         f"<b>Package:</b> {pkg}<br/>"
         f"<b>Monthly fee:</b> {fee}<br/>"
         f"<b>Address:</b> {addr}"
-        f"]]>"
+        + (f"<br/><b>Location precision:</b> {xml_escape(precision)}" if precision else "")
+        + f"]]>"
     )
     return (
         f"    <Placemark>\n"
@@ -136,86 +320,174 @@ def make_placemark(rec, lat, lng):
         f"    </Placemark>"
     ), tier_name
 
+def index_row(rec, lat, lng, precision=None):
+    """Customer attributes stored in the spatial index (customer_index.py)."""
+    tier_name, style_id = tier_for(rec.get("monthly_fee"))
+    return {
+        "account": rec.get("account_number") or rec.get("source_filename"),
+        "package": rec.get("package_name"),
+        "monthly_fee": rec.get("monthly_fee"),
+        "fee": fee_value(rec.get("monthly_fee")),
+        "tier": tier_name,
+        "style_id": style_id,
+        "address": rec.get("physical_address"),
+        "lat": lat,
+        "lng": lng,
+        "precision": precision,
+    }
+
 # ── main ──────────────────────────────────────────────────────────────────────
 def main():
+    parser = argparse.ArgumentParser(description="Geocode contract addresses into a KML map")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"concurrent geocoding requests (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help=f"max geocoding requests per second (default: {DEFAULT_RATE:g})")
+    parser.add_argument("--ttl-days", type=float, default=DEFAULT_TTL_DAYS,
+                        help=f"re-geocode successful lookups older than this (default: {DEFAULT_TTL_DAYS})")
+    parser.add_argument("--negative-ttl-days", type=float, default=DEFAULT_NEGATIVE_TTL_DAYS,
+                        help=f"retry failed lookups older than this (default: {DEFAULT_NEGATIVE_TTL_DAYS})")
+    parser.add_argument("--kmz", action="store_true",
+                        help="write a zipped .kmz instead of plain .kml")
+    parser.add_argument("--lod", action="store_true",
+                        help="write a clustered level-of-detail map with Region-loaded tiles")
+    parser.add_argument("--leaf-size", type=int, default=250,
+                        help="max customers per --lod tile before it is split (default: 250)")
+    parser.add_argument("--gazetteer", choices=["off", "first", "fallback", "only"], default="off",
+                        help="offline postal-code geocoding: before the API, for API failures, "
+                             "or instead of it (default: off)")
+    parser.add_argument("--gazetteer-db", type=Path, default=GAZETTEER,
+                        help=f"gazetteer database (default: {GAZETTEER})")
+    parser.add_argument("--index", nargs="?", type=Path, const=INDEX,
+                        help=f"also write the customer spatial index (default path: {INDEX})")
+    args = parser.parse_args()
+
     records = json.loads(INPUT.read_text())
     print(f"Loaded {len(records)} records")
 
-    # Load or init cache
-    if CACHE.exists():
-        cache = json.loads(CACHE.read_text())
-        print(f"Cache: {len(cache)} entries")
-    else:
-        cache = {}
+    # Open cache, seeding it from the legacy JSON cache on first use
+    fresh = not CACHE.exists()
+    cache = GeocodeCache(CACHE, ttl_days=args.ttl_days, negative_ttl_days=args.negative_ttl_days)
+    if fresh and LEGACY_CACHE.exists():
+        n = cache.import_entries(normalize_cache(json.loads(LEGACY_CACHE.read_text())).items())
+        print(f"Imported {n} entries from {LEGACY_CACHE}")
+    print(f"Cache: {len(cache)} entries")
 
-    # Build tier buckets
-    buckets = {name: [] for name, _ in TIERS}
-    skipped = 0
-    geocoded = 0
-    errors = 0
+    groups = group_by_address(records)
+    with_addr = sum(len(recs) for recs in groups.values())
+    if with_addr:
+        print(f"Unique addresses: {len(groups)}/{with_addr} "
+              f"({len(groups) / with_addr:.1%} of records with an address)")
 
-    total = len(records)
-    for i, rec in enumerate(records, 1):
-        addr = rec.get("physical_address", "").strip()
-        if not addr:
-            skipped += 1
-            continue
+    # Resolve coordinates: key → (lat, lng, precision)
+    located = {}
+    gazetteer = None
+    if args.gazetteer != "off":
+        if not args.gazetteer_db.exists():
+            sys.exit(f"ERROR: no gazetteer at {args.gazetteer_db}. Build it with: python3 scripts/postcode_gazetteer.py build ...")
+        gazetteer = Gazetteer(args.gazetteer_db)
+        print(f"Gazetteer: {len(gazetteer)} postal codes")
 
-        if i % 50 == 0 or i == total:
-            print(f"  [{i}/{total}] geocoded={geocoded} errors={errors} skipped={skipped}")
+    if args.gazetteer in ("first", "only"):
+        for key in groups:
+            hit = gazetteer.lookup(key)
+            if hit:
+                located[key] = hit
+        print(f"Gazetteer resolved {len(located)}/{len(groups)} addresses offline")
 
-        coords = geocode(addr, cache)
+    api_keys = [] if args.gazetteer == "only" else [k for k in groups if k not in located]
+    if api_keys:
+        if any(key not in cache for key in api_keys) and not API_KEY:
+            sys.exit("ERROR: GOOGLE_MAPS_SERVER_KEY not set. Run: set -a && source .env.local && set +a && python3 scripts/geocode_to_kml.py")
 
-        if coords is None:
-            errors += 1
-            continue
+        started = time.monotonic()
+        hits, fetched = geocode_all(api_keys, cache, workers=args.workers, rate=args.rate)
+        hit_rate = hits / len(api_keys)
+        print(f"Geocoding done in {time.monotonic() - started:.1f}s "
+              f"(cache hits={hits} [{hit_rate:.1%}], fetched={fetched})")
+        for key in api_keys:
+            _, coords, precision = cache.lookup(key)
+            if coords is not None:
+                # Entries imported from the JSON cache predate precision tags.
+                located[key] = (coords[0], coords[1], precision or "api")
 
-        geocoded += 1
-        lat, lng = coords
-        placemark, tier_name = make_placemark(rec, lat, lng)
-        buckets[tier_name].append(placemark)
+    if args.gazetteer == "fallback":
+        recovered = 0
+        for key in groups:
+            if key not in located:
+                hit = gazetteer.lookup(key)
+                if hit:
+                    located[key] = hit
+                    recovered += 1
+        print(f"Gazetteer recovered {recovered} addresses the API could not place")
 
-        # Rate-limit: ~10 req/s comfortably within free tier (50 req/s limit)
-        time.sleep(0.11)
+    skipped = len(records) - with_addr
+    geocoded = 0
+    errors = 0
+    # Customers go into the spatial index as they are placed, in one
+    # transaction committed once the map is written
+    index = CustomerIndex(args.index) if args.index else None
+    if index:
+        index.begin_rebuild()
 
-    # Save cache after every run
-    CACHE.write_text(json.dumps(cache, indent=2))
-    print(f"\nCache saved: {len(cache)} entries → {CACHE}")
+    def placemarks():
+        nonlocal geocoded, errors
+        for key, recs in groups.items():
+            if key not in located:
+                errors += len(recs)
+                continue
 
-    # Assemble KML
-    folder_xml = []
-    for tier_name, _ in TIERS:
-        pms = buckets.get(tier_name, [])
-        if not pms:
-            continue
-        inner = "\n".join(pms)
-        folder_xml.append(
-            f"  <Folder>\n"
-            f"    <name>{tier_name} ({len(pms)} customers)</name>\n"
-            f"    <open>0</open>\n"
-            f"{inner}\n"
-            f"  </Folder>"
+            lat, lng, precision = located[key]
+            for rec in recs:
+                geocoded += 1
+                if index:
+                    index.add(index_row(rec, lat, lng, precision))
+                placemark, tier_name = make_placemark(rec, lat, lng, precision)
+                yield lat, lng, tier_name, placemark, rec
+
+    counts = {name: 0 for name, _ in TIERS}
+    if args.lod:
+        # Level-of-detail tree: needs every point up front to build the quadtree
+        output = LOD_OUTPUT.with_suffix(".kmz") if args.kmz else LOD_OUTPUT
+        points = []
+        for lat, lng, tier_name, placemark, rec in placemarks():
+            counts[tier_name] += 1
+            _, style_id = tier_for(rec.get("monthly_fee"))
+            points.append((lat, lng, tier_name, style_id, placemark))
+        tiles, leaves, depth = write_lod(
+            output, points, STYLE_IDS, [name for name, _ in TIERS],
+            name="CircleTel Customer Contracts",
+            description="Customer clusters by monthly fee tier; zoom in for individual customers",
+            base_styles=make_styles(),
+            leaf_size=args.leaf_size,
+            kmz=args.kmz,
         )
+        print(f"\nLOD map written → {output} ({tiles} tiles, {leaves} leaves, depth {depth})")
+    else:
+        # Stream placemarks into per-tier spools, then assemble the document
+        output = OUTPUT.with_suffix(".kmz") if args.kmz else OUTPUT
+        with KmlWriter(
+            output,
+            [name for name, _ in TIERS],
+            name="CircleTel Customer Contracts",
+            description="Customer locations coloured by monthly fee tier",
+            styles=make_styles(),
+            kmz=args.kmz,
+        ) as kml:
+            for _, _, tier_name, placemark, _ in placemarks():
+                kml.add(tier_name, placemark)
+        counts.update(kml.counts)
+        print(f"\n{'KMZ' if args.kmz else 'KML'} written → {output}")
 
-    kml = (
-        '<?xml version="1.0" encoding="UTF-8"?>\n'
-        '<kml xmlns="http://www.opengis.net/kml/2.2">\n'
-        '<Document>\n'
-        '  <name>CircleTel Customer Contracts</name>\n'
-        '  <description>Customer locations coloured by monthly fee tier</description>\n'
-        + make_styles() + "\n"
-        + "\n".join(folder_xml) + "\n"
-        '</Document>\n'
-        '</kml>\n'
-    )
+    if index:
+        n = index.finish_rebuild()
+        print(f"Spatial index written → {args.index} ({n} customers)")
 
-    OUTPUT.write_text(kml, encoding="utf-8")
-    print(f"\nKML written → {OUTPUT}")
     print(f"  Geocoded: {geocoded}")
     print(f"  Failed:   {errors}")
     print(f"  Skipped (no address): {skipped}")
     for tier_name, _ in TIERS:
-        n = len(buckets.get(tier_name, []))
+        n = counts.get(tier_name, 0)
         if n:
             print(f"  {tier_name}: {n}")
 
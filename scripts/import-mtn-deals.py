@@ -5,15 +5,36 @@ Import MTN Business Deals from JSON to Supabase
 
 import json
 import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
+from deal_frontier import build_frontiers, store_frontiers
+from deal_mapping import MappingError, compile_mapper, deal_hash
+from deal_snapshot import load_deals
+from mtn_deals import DEALS_JSON
+
 # Load environment variables
 load_dotenv('.env.local')
 
 SUPABASE_URL = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+# Recorded in metadata.source unless the input file names another promo
+SOURCE = 'Helios and iLula Business Promos - Oct 2025'
+
+# Direct Postgres connection for the COPY loader (optional, needs psycopg 3)
+DATABASE_URL = os.getenv('SUPABASE_DB_URL') or os.getenv('DATABASE_URL')
+# Hosts the loader benchmark may write to (a `supabase start` stack)
+LOCAL_HOSTS = {'localhost', '127.0.0.1', '::1'}
+
+def is_local_url(url):
+    return (urlparse(url).hostname or '') in LOCAL_HOSTS
 
 def parse_date(date_str):
     """Parse date string to YYYY-MM-DD format"""
@@ -43,15 +64,19 @@ def calculate_ex_vat(incl_vat):
         return 0
     return round(incl_vat / 1.15, 2)
 
-def map_deal_to_db(deal):
-    """Map JSON deal to database record"""
+def map_deal_to_db(deal, source=SOURCE):
+    """Map JSON deal to database record, one row at a time.
+
+    map_deals() uses the mapper compiled from deal_mapping.SCHEMA; this is
+    kept as the reference it is checked and timed against (--benchmark-mapper).
+    """
     
     # Calculate ex VAT if not provided or is 0
     monthly_ex_vat = deal.get('Total Subscription Ex Vat', 0)
     if monthly_ex_vat == 0:
         monthly_ex_vat = calculate_ex_vat(deal.get('Total Subscription Incl Vat', 0))
     
-    return {
+    record = {
         # Deal identification
         'deal_id': deal['Deal ID'],
         'deal_name': f"{deal['Price Plan']} + {deal['OEM and Device']} ({deal['Contract Term']}M)",
@@ -95,8 +120,8 @@ def map_deal_to_db(deal):
         'free_sim': parse_boolean(deal.get('Free Sim', False)),
         'free_cli': parse_boolean(deal.get('Free CLI', False)),
         'free_itb': parse_boolean(deal.get('Free ITB', False)),
-        'freebie_devices': clean_text(deal.get('Freebies description 1\\n(Devices)')),
-        'freebie_priceplan': clean_text(deal.get('Freebie description 2\\n(Priceplan)')),
+        'freebie_devices': clean_text(deal.get('Freebies description 1\n(Devices)')),
+        'freebie_priceplan': clean_text(deal.get('Freebie description 2\n(Priceplan)')),
         
         # Availability
         'available_helios': parse_boolean(deal.get('Available on Helios', True)),
@@ -118,91 +143,505 @@ def map_deal_to_db(deal):
         # Store original deal as metadata
         'metadata': {
             'import_date': datetime.now().isoformat(),
-            'source': 'Helios and iLula Business Promos - Oct 2025',
+            'source': source,
             'original_deal_id': deal['Deal ID']
         }
     }
+    record['metadata']['content_hash'] = deal_hash(record)
+    return record
 
-def import_deals(supabase: Client, deals, batch_size=100, test_mode=False):
-    """Import deals to Supabase in batches"""
+def is_transient(exc):
+    """Network / server hiccups are retried; data errors (SQLSTATE classes
+    22 data exception, 23 integrity violation and 42 syntax / access rule,
+    PostgREST PGRST*) fail the same way every time and are bisected."""
+    code = str(getattr(exc, 'code', '') or '')
+    return not (code.startswith(('22', '23', '42', 'PGRST')))
+
+def write_batch(supabase: Client, records, mode='upsert', retries=3, backoff=0.5):
+    """Write one batch, retrying transient errors with exponential backoff.
+
+    A batch that fails for a data error is split in half and each half
+    written on its own, recursively, so only the offending rows are
+    rejected. A transient error that outlasts the retries rejects the
+    whole batch as is: bisecting would only repeat the outage per row.
+    Returns (written, [(deal_id, error)]).
+    """
+    for attempt in range(retries + 1):
+        try:
+            table = supabase.table('mtn_business_deals')
+            if mode == 'upsert':
+                table.upsert(records, on_conflict='deal_id', returning='minimal').execute()
+            else:
+                table.insert(records, returning='minimal').execute()
+            return len(records), []
+        except Exception as e:
+            if is_transient(e) and attempt < retries:
+                time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+                continue
+            error = e
+            break
+
+    if is_transient(error) or len(records) == 1:
+        return 0, [(r['deal_id'], str(error)) for r in records]
+    mid = len(records) // 2
+    left = write_batch(supabase, records[:mid], mode, retries, backoff)
+    right = write_batch(supabase, records[mid:], mode, retries, backoff)
+    return left[0] + right[0], left[1] + right[1]
+
+def map_deals(deals, source=SOURCE, timings=None):
+    """Map JSON deals to database records with the compiled schema mapper.
+
+    Returns (records, rejects, duplicates). A deal_id seen twice keeps its
+    last row, since one upsert statement cannot touch the same row twice.
+    When `timings` is a dict, time spent pulling rows from the source and
+    mapping them is added under 'read' and 'map'.
+    """
+    map_row, column_errors = compile_mapper(source)
+    rejects = []
+    duplicates = 0
+    records = {}
+    read = mapping = 0.0
+    deals = iter(deals)
+    while True:
+        t0 = time.perf_counter()
+        deal = next(deals, None)
+        t1 = time.perf_counter()
+        read += t1 - t0
+        if deal is None:
+            break
+        try:
+            db_record = map_row(deal)
+        except MappingError as e:
+            print(f"  [ERROR] Failed to map deal {deal.get('Deal ID', 'UNKNOWN')}: {e}")
+            rejects.append((deal.get('Deal ID'), f"mapping: {e}"))
+            continue
+        finally:
+            mapping += time.perf_counter() - t1
+        if db_record['deal_id'] in records:
+            duplicates += 1
+        records[db_record['deal_id']] = db_record
+    if column_errors:
+        print(f"  Mapping errors by column: "
+              f"{', '.join(f'{c} ({n:,})' for c, n in column_errors.most_common())}")
+    if timings is not None:
+        timings['read'] = timings.get('read', 0.0) + read
+        timings['map'] = timings.get('map', 0.0) + mapping
+    return list(records.values()), rejects, duplicates
+
+def rest_load(supabase: Client, records, batch_size=100, mode='upsert', workers=4, retries=3):
+    """Write records through PostgREST in concurrent batches; returns (written, rejects)."""
+    batches = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
+    total_batches = len(batches)
+    imported = 0
+    done = 0
+    rejects = []
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(write_batch, supabase, batch, mode, retries) for batch in batches]
+        for future in as_completed(futures):
+            written, failed = future.result()
+            done += 1
+            imported += written
+            rejects.extend(failed)
+            status = "✓" if not failed else "!"
+            print(f"  {status} Batch {done}/{total_batches}: {written} written, {len(failed)} rejected "
+                  f"(Total: {imported:,}/{len(records):,})")
+    return imported, rejects
+
+def copy_load(database_url, records, mode='upsert'):
+    """Stream records through COPY into a staging table and merge them into
+    mtn_business_deals in a single transaction; returns rows written.
+
+    Needs psycopg 3 (pip install "psycopg[binary]") and a direct Postgres
+    connection string. All-or-nothing: any bad row rolls the whole load back.
+    """
+    import psycopg
+    from psycopg.types.json import Jsonb
+    
+    if not records:
+        return 0
+    cols = list(records[0].keys())
+    col_list = ', '.join(cols)
+    if mode == 'upsert':
+        updates = ', '.join(f"{c} = EXCLUDED.{c}" for c in cols if c != 'deal_id')
+        conflict = f"ON CONFLICT (deal_id) DO UPDATE SET {updates}"
+    else:
+        conflict = ""
+    
+    with psycopg.connect(database_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "CREATE TEMP TABLE mtn_business_deals_staging "
+                "(LIKE mtn_business_deals INCLUDING DEFAULTS) ON COMMIT DROP")
+            with cur.copy(f"COPY mtn_business_deals_staging ({col_list}) FROM STDIN") as copy:
+                for r in records:
+                    copy.write_row([Jsonb(r[c]) if isinstance(r[c], dict) else r[c] for c in cols])
+            cur.execute(
+                f"INSERT INTO mtn_business_deals ({col_list}) "
+                f"SELECT {col_list} FROM mtn_business_deals_staging {conflict}")
+            written = cur.rowcount
+        conn.commit()
+    return written
+
+def fetch_stored_hashes(supabase: Client, page_size=1000):
+    """{deal_id: (content_hash, active)} for every stored deal.
+
+    A single projection (three small columns, the hash pulled out of
+    metadata), paged only because PostgREST caps rows per response.
+    """
+    stored = {}
+    start = 0
+    while True:
+        response = (supabase.table('mtn_business_deals')
+                    .select('deal_id,active,content_hash:metadata->>content_hash')
+                    .order('deal_id')
+                    .range(start, start + page_size - 1)
+                    .execute())
+        for row in response.data:
+            stored[row['deal_id']] = (row.get('content_hash'), row.get('active'))
+        if len(response.data) < page_size:
+            return stored
+        start += page_size
+
+def plan_delta(records, stored):
+    """Split mapped records against stored hashes.
+
+    Returns (new, changed, unchanged, vanished_ids). A stored deal that was
+    deactivated but is back in the sheet counts as changed, so the upsert
+    reactivates it.
+    """
+    new, changed = [], []
+    unchanged = 0
+    for record in records:
+        current = stored.get(record['deal_id'])
+        if current is None:
+            new.append(record)
+        elif current[0] != record['metadata']['content_hash'] or not current[1]:
+            changed.append(record)
+        else:
+            unchanged += 1
+    seen = {r['deal_id'] for r in records}
+    vanished = [deal_id for deal_id, (_, active) in stored.items() if active and deal_id not in seen]
+    return new, changed, unchanged, vanished
+
+def deactivate_deals(supabase: Client, deal_ids, batch_size=200):
+    """Mark deals that left the sheet inactive; returns how many were updated."""
+    for i in range(0, len(deal_ids), batch_size):
+        (supabase.table('mtn_business_deals')
+         .update({'active': False}, returning='minimal')
+         .in_('deal_id', deal_ids[i:i + batch_size])
+         .execute())
+    return len(deal_ids)
+
+def import_deals(supabase: Client, deals, batch_size=100, test_mode=False,
+                 mode='upsert', workers=4, retries=3, rejects_path=None,
+                 loader='rest', database_url=None, delta=False, source=SOURCE, timings=None,
+                 frontiers=True):
+    """Import deals to Supabase.
+
+    In upsert mode (the default) rows are merged on deal_id, so re-running
+    the import updates deals in place instead of duplicating them. With
+    delta=True only new and changed deals (by content hash) are written,
+    and deals missing from the sheet are deactivated. The
+    'copy' loader goes straight to Postgres via COPY and falls back to the
+    REST path when psycopg or a connection string is missing, or when the
+    load fails (the REST path then isolates and reports the bad rows).
+    With frontiers=True the per-device, per-term cheapest-deal frontiers
+    (deal_frontier.py) are rebuilt from the full sheet and stored.
+    Per-stage seconds are recorded in `timings` if given.
+    """
+    timings = {} if timings is None else timings
     
-    total = len(deals)
     if test_mode:
-        deals = deals[:batch_size]
-        total = len(deals)
-        print(f"\n[TEST MODE] Importing {total} deals only")
+        deals = islice(deals, batch_size)
+        print(f"\n[TEST MODE] Importing {batch_size} deals only")
     
-    print(f"\nStarting import of {total:,} deals...")
-    print(f"Batch size: {batch_size}")
+    records, rejects, duplicates = map_deals(deals, source, timings)
+    total = len(records) + len(rejects) + duplicates
+    mapping_errors = len(rejects)
     
-    imported = 0
-    errors = 0
+    sheet = records
+    vanished = []
+    if delta:
+        stage = time.perf_counter()
+        stored = fetch_stored_hashes(supabase)
+        new, changed, unchanged, vanished = plan_delta(records, stored)
+        print(f"\nDelta against {len(stored):,} stored deals:")
+        print(f"  New:       {len(new):,}")
+        print(f"  Changed:   {len(changed):,}")
+        print(f"  Unchanged: {unchanged:,} (skipped)")
+        print(f"  Vanished:  {len(vanished):,}")
+        records = new + changed
+        mode = 'upsert'
+        timings['delta'] = time.perf_counter() - stage
     
-    for i in range(0, total, batch_size):
-        batch = deals[i:i + batch_size]
-        batch_num = (i // batch_size) + 1
-        total_batches = (total + batch_size - 1) // batch_size
-        
-        print(f"\nProcessing batch {batch_num}/{total_batches} ({len(batch)} deals)...")
-        
-        # Map deals to database format
-        db_records = []
-        for deal in batch:
-            try:
-                db_record = map_deal_to_db(deal)
-                db_records.append(db_record)
-            except Exception as e:
-                print(f"  [ERROR] Failed to map deal {deal.get('Deal ID', 'UNKNOWN')}: {e}")
-                errors += 1
-        
-        # Insert batch
+    if loader == 'copy':
         try:
-            response = supabase.table('mtn_business_deals').insert(db_records).execute()
-            imported += len(db_records)
-            print(f"  ✓ Imported {len(db_records)} deals (Total: {imported:,}/{total:,})")
+            if not database_url:
+                raise RuntimeError("no SUPABASE_DB_URL / DATABASE_URL set")
+            print(f"\nStarting COPY {mode} of {len(records):,} deals...")
+            started = time.perf_counter()
+            imported = copy_load(database_url, records, mode)
+        except ImportError:
+            print("\n[WARN] psycopg not installed (pip install \"psycopg[binary]\"), falling back to REST")
+            loader = 'rest'
         except Exception as e:
-            print(f"  [ERROR] Batch insert failed: {e}")
-            errors += len(db_records)
+            print(f"\n[WARN] COPY load failed ({e}), falling back to REST")
+            loader = 'rest'
+    
+    if loader == 'rest':
+        print(f"\nStarting {mode} of {len(records):,} deals...")
+        print(f"Batch size: {batch_size}, workers: {workers}")
+        started = time.perf_counter()
+        imported, failed = rest_load(supabase, records, batch_size, mode, workers, retries)
+        rejects.extend(failed)
+    
+    elapsed = time.perf_counter() - started
+    timings['write'] = elapsed
+    
+    deactivated = 0
+    if vanished:
+        if test_mode:
+            print(f"\n[TEST MODE] Not deactivating {len(vanished):,} deals missing from the sample")
+        else:
+            stage = time.perf_counter()
+            deactivated = deactivate_deals(supabase, vanished)
+            timings['deactivate'] = time.perf_counter() - stage
+    
+    frontier_rows = 0
+    if frontiers:
+        if test_mode:
+            print(f"\n[TEST MODE] Not rebuilding deal frontiers from the sample")
+        else:
+            stage = time.perf_counter()
+            try:
+                frontier_rows = store_frontiers(supabase, build_frontiers(sheet), source)
+            except Exception as e:
+                print(f"\n[WARN] Could not store deal frontiers: {e}")
+            timings['frontiers'] = time.perf_counter() - stage
+    errors = len(rejects)
+    attempted = len(records) + mapping_errors
     
     print(f"\n{'='*80}")
     print(f"IMPORT COMPLETE")
     print(f"{'='*80}")
     print(f"Total Deals: {total:,}")
-    print(f"Imported: {imported:,}")
+    print(f"Imported: {imported:,} ({loader} {mode}, {elapsed:.1f}s, "
+          f"{imported / elapsed if elapsed else 0:,.0f} rows/s)")
+    if delta:
+        print(f"Deactivated: {deactivated:,}")
+    if frontier_rows:
+        print(f"Deal frontiers: {frontier_rows:,} device/term pairs")
     print(f"Errors: {errors:,}")
-    print(f"Success Rate: {(imported/total*100):.1f}%")
+    if duplicates:
+        print(f"Duplicate deal IDs in source: {duplicates:,} (last row kept)")
+    print(f"Success Rate: {(imported/attempted*100 if attempted else 100):.1f}%")
+    
+    if rejects:
+        print(f"\nRejected rows:")
+        for deal_id, error in rejects[:20]:
+            print(f"  - {deal_id}: {error}")
+        if len(rejects) > 20:
+            print(f"  ... and {len(rejects) - 20:,} more")
+        if rejects_path:
+            with open(rejects_path, 'w', encoding='utf-8') as f:
+                json.dump([{'deal_id': d, 'error': e} for d, e in rejects], f, indent=2)
+            print(f"  Full report written to {rejects_path}")
     
     return imported, errors
 
+def benchmark_loaders(supabase: Client, database_url, deals, batch_size=100, workers=4, runs=3):
+    """Time the COPY and REST loaders upserting the same deals (best of `runs`).
+
+    Both loaders really write, so main() only runs this against a local stack.
+    """
+    records, _, _ = map_deals(deals)
+    print(f"\nBenchmarking {len(records):,} deals, best of {runs}...")
+    results = {}
+    loaders = {
+        'copy': lambda: copy_load(database_url, records),
+        'rest': lambda: rest_load(supabase, records, batch_size, 'upsert', workers)[0],
+    }
+    for name, load in loaders.items():
+        if name == 'copy' and not database_url:
+            print("  copy: skipped (no SUPABASE_DB_URL / DATABASE_URL)")
+            continue
+        best = None
+        for _ in range(runs):
+            started = time.perf_counter()
+            try:
+                load()
+            except ImportError:
+                print("  copy: skipped (psycopg not installed)")
+                break
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        if best is not None:
+            results[name] = best
+    
+    print(f"\n{'Loader':8s} {'Seconds':>9s} {'Rows/s':>10s}")
+    for name, best in results.items():
+        print(f"{name:8s} {best:9.2f} {len(records) / best:10,.0f}")
+    if len(results) == 2:
+        print(f"\nCOPY speed-up: {results['rest'] / results['copy']:.1f}x")
+    return results
+
+def benchmark_mappers(deals, runs=3):
+    """Time map_deal_to_db() against the compiled mapper on the same deals
+    (best of `runs`) and check they produce the same records."""
+    deals = list(deals)
+    map_row, _ = compile_mapper(SOURCE)
+    mappers = {
+        'row-at-a-time': lambda deal: map_deal_to_db(deal),
+        'compiled': map_row,
+    }
+    print(f"\nBenchmarking mappers on {len(deals):,} deals, best of {runs}...")
+    results, outputs = {}, {}
+    for name, mapper in mappers.items():
+        best = None
+        for _ in range(runs):
+            started = time.perf_counter()
+            records = [mapper(deal) for deal in deals]
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results[name], outputs[name] = best, records
+    
+    print(f"\n{'Mapper':14s} {'Seconds':>9s} {'Rows/s':>10s}")
+    for name, best in results.items():
+        print(f"{name:14s} {best:9.3f} {len(deals) / best:10,.0f}")
+    print(f"\nCompiled speed-up: {results['row-at-a-time'] / results['compiled']:.1f}x")
+    
+    strip = lambda r: {**r, 'metadata': {**r['metadata'], 'import_date': None}}
+    mismatched = sum(strip(a) != strip(b) for a, b in zip(outputs['row-at-a-time'], outputs['compiled']))
+    print(f"Records differing: {mismatched:,}")
+    return results
+
+def summarize_deals(rows):
+    """Aggregate projected deal rows locally into the same shape as the
+    mtn_business_deals_summary() RPC."""
+    by_term, by_plan, by_device = {}, {}, {}
+    total = active = 0
+    price_min = price_max = None
+    price_sum = 0.0
+    for row in rows:
+        total += 1
+        active += bool(row.get('active'))
+        term = str(row['contract_term'])
+        device = row.get('device_name') or '(none)'
+        by_term[term] = by_term.get(term, 0) + 1
+        by_plan[row['price_plan']] = by_plan.get(row['price_plan'], 0) + 1
+        by_device[device] = by_device.get(device, 0) + 1
+        price = float(row['monthly_price_incl_vat'])
+        price_sum += price
+        price_min = price if price_min is None else min(price_min, price)
+        price_max = price if price_max is None else max(price_max, price)
+    return {
+        'total': total,
+        'active': active,
+        'price': {'min': price_min, 'max': price_max,
+                  'avg': round(price_sum / total, 2)} if total else None,
+        'by_term': by_term,
+        'by_price_plan': by_plan,
+        'by_device': by_device,
+        'sample': [],
+    }
+
+def fetch_summary(supabase: Client, page_size=1000):
+    """Deal summary in one RPC call, or from one projected fetch aggregated
+    locally when the RPC has not been deployed yet. Returns (summary, source)."""
+    try:
+        return supabase.rpc('mtn_business_deals_summary').execute().data, 'rpc'
+    except Exception as e:
+        # PGRST202: not in PostgREST's schema cache; 42883: undefined function
+        if str(getattr(e, 'code', '') or '') not in ('PGRST202', '42883'):
+            raise
+        print("  (mtn_business_deals_summary RPC not deployed; aggregating locally)")
+    
+    rows = []
+    start = 0
+    while True:
+        response = (supabase.table('mtn_business_deals')
+                    .select('contract_term,price_plan,device_name,monthly_price_incl_vat,active')
+                    .order('deal_id')
+                    .range(start, start + page_size - 1)
+                    .execute())
+        rows.extend(response.data)
+        if len(response.data) < page_size:
+            break
+        start += page_size
+    summary = summarize_deals(rows)
+    summary['sample'] = [
+        {'deal_name': d['deal_name'], 'monthly_price_incl_vat': d['monthly_price_incl_vat']}
+        for d in supabase.table('mtn_business_deals')
+                         .select('deal_name,monthly_price_incl_vat').limit(5).execute().data
+    ]
+    return summary, 'projected fetch'
+
 def verify_import(supabase: Client):
     """Verify imported data"""
     print(f"\n{'='*80}")
     print("VERIFICATION")
     print(f"{'='*80}")
     
-    # Count total deals
-    response = supabase.table('mtn_business_deals').select('id', count='exact').execute()
-    total = response.count
-    print(f"\nTotal deals in database: {total:,}")
+    started = time.perf_counter()
+    summary, source = fetch_summary(supabase)
+    elapsed = time.perf_counter() - started
+    
+    print(f"\nTotal deals in database: {summary['total']:,} ({summary['active']:,} active)")
+    print(f"  (summary via {source} in {elapsed * 1000:.0f} ms)")
     
     # Count by contract term
-    for term in [1, 3, 6, 12, 18, 24, 36]:
-        response = supabase.table('mtn_business_deals').select('id', count='exact').eq('contract_term', term).execute()
-        print(f"  {term} months: {response.count:,} deals")
+    for term, count in sorted(summary['by_term'].items(), key=lambda x: int(x[0])):
+        print(f"  {term} months: {count:,} deals")
+    
+    price = summary.get('price')
+    if price:
+        print(f"\nMonthly price (incl VAT): min R{float(price['min']):,.2f} | "
+              f"max R{float(price['max']):,.2f} | avg R{float(price['avg']):,.2f}")
+    
+    for title, key in (('Price plans', 'by_price_plan'), ('Devices', 'by_device')):
+        groups = summary[key]
+        print(f"\n{title} ({len(groups):,}, top 10):")
+        for name, count in sorted(groups.items(), key=lambda x: x[1], reverse=True)[:10]:
+            print(f"  {name[:50]:50s} {count:>6,}")
     
     # Sample deals
-    response = supabase.table('mtn_business_deals').select('*').limit(5).execute()
     print(f"\nSample deals:")
-    for deal in response.data:
+    for deal in summary['sample']:
         print(f"  - {deal['deal_name']} | R{deal['monthly_price_incl_vat']}/mo")
+    
+    return summary
 
 def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Import MTN Business Deals to Supabase')
+    parser.add_argument('--input', default=str(DEALS_JSON),
+                        help='Deals workbook (.xlsx, read directly), JSON from excel-to-json.py, '
+                             'or a .jsonl file (one deal per line)')
     parser.add_argument('--test', action='store_true', help='Test mode: import only 100 deals')
     parser.add_argument('--batch-size', type=int, default=100, help='Batch size (default: 100)')
     parser.add_argument('--verify-only', action='store_true', help='Only verify existing data')
+    parser.add_argument('--mode', choices=['upsert', 'insert'], default='upsert',
+                        help='upsert on deal_id (re-runnable, default) or plain insert')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent batch writers (default: 4)')
+    parser.add_argument('--retries', type=int, default=3, help='Retries per batch on transient errors (default: 3)')
+    parser.add_argument('--delta', action='store_true',
+                        help='Write only new/changed deals (by content hash) and deactivate vanished ones')
+    parser.add_argument('--loader', choices=['rest', 'copy'], default='rest',
+                        help='rest (PostgREST batches) or copy (COPY into a staging table over '
+                             'SUPABASE_DB_URL / DATABASE_URL, needs psycopg; falls back to rest)')
+    parser.add_argument('--db-url',
+                        help='Postgres connection string for the copy loader (default: SUPABASE_DB_URL / DATABASE_URL)')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Time the copy and rest loaders on the same deals, then exit; writes every deal, '
+                             'so it needs an explicit local --db-url and a local NEXT_PUBLIC_SUPABASE_URL')
+    parser.add_argument('--benchmark-mapper', action='store_true',
+                        help='Time the compiled row mapper against map_deal_to_db(), then exit (no database)')
+    parser.add_argument('--no-frontiers', action='store_true',
+                        help='Skip rebuilding the cheapest-deal frontiers (mtn_deal_frontiers)')
+    parser.add_argument('--rejects', default='mtn_deals_rejects.json',
+                        help='Where to write the rejected-row report (default: mtn_deals_rejects.json)')
     
     args = parser.parse_args()
     
@@ -210,6 +649,15 @@ def main():
     print("MTN BUSINESS DEALS IMPORT")
     print("="*80)
     
+    if args.benchmark and not (args.db_url and is_local_url(args.db_url) and is_local_url(SUPABASE_URL or '')):
+        parser.error('--benchmark upserts every deal: pass --db-url for a local database '
+                     '(e.g. supabase start) and point NEXT_PUBLIC_SUPABASE_URL at it too')
+    
+    if args.benchmark_mapper:
+        print(f"\nReading deals from: {args.input}")
+        benchmark_mappers(load_deals(args.input))
+        return
+    
     # Connect to Supabase
     if not SUPABASE_URL or not SUPABASE_KEY:
         print("\n[ERROR] Supabase credentials not found in .env.local")
@@ -223,27 +671,48 @@ def main():
         verify_import(supabase)
         return
     
-    # Load JSON deals
-    json_path = 'docs/products/01_ACTIVE_PRODUCTS/MTN Deals/Oct-2025/Helios and iLula Business Promos - Oct 2025 - Deals.json'
-    print(f"\nLoading deals from: {json_path}")
-    
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # Deals from the Arrow snapshot of the workbook / JSON export (rebuilt
+    # when the source changes), or streamed from the source without pyarrow
+    print(f"\nReading deals from: {args.input}")
+    deals = load_deals(args.input)
+    source = Path(args.input).stem.replace(' - Deals', '')
     
-    deals = data['data']['Sheet1']['data']
-    print(f"✓ Loaded {len(deals):,} deals from JSON")
+    if args.benchmark:
+        benchmark_loaders(supabase, args.db_url,
+                          islice(deals, args.batch_size) if args.test else deals,
+                          batch_size=args.batch_size, workers=args.workers)
+        return
     
     # Import
+    timings = {}
+    started = time.perf_counter()
     imported, errors = import_deals(
         supabase, 
         deals, 
         batch_size=args.batch_size,
-        test_mode=args.test
+        test_mode=args.test,
+        mode=args.mode,
+        workers=args.workers,
+        retries=args.retries,
+        rejects_path=args.rejects,
+        loader=args.loader,
+        database_url=args.db_url or DATABASE_URL,
+        delta=args.delta,
+        source=source,
+        timings=timings,
+        frontiers=not args.no_frontiers
     )
     
     # Verify
     if imported > 0:
+        stage = time.perf_counter()
         verify_import(supabase)
+        timings['verify'] = time.perf_counter() - stage
+    
+    print(f"\nStage timings:")
+    for stage, seconds in timings.items():
+        print(f"  {stage:12s} {seconds:8.2f}s")
+    print(f"  {'total':12s} {time.perf_counter() - started:8.2f}s")
     
     print("\n" + "="*80 + "\n")
 
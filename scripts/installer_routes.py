@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Group geocoded customers into balanced installer territories / route batches.
+
+Runs a capacity-constrained spherical k-means over the customers in the
+spatial index (geocode_to_kml.py --index): points live on the unit sphere
+as 3-D vectors, so distances are exact great-circle (haversine) distances
+and every step is a NumPy array operation. The assignment step respects a
+per-cluster capacity: points are placed in order of how much they would
+lose by not getting their nearest centre, each taking the nearest centre
+that still has room. Each cluster is anchored on its medoid-like member
+(the real customer nearest the centroid) as a natural start point.
+
+Writes, for --out PREFIX:
+  PREFIX.kml       one folder per cluster (KmlWriter), anchor starred
+  PREFIX.geojson   every customer with its "cluster" property
+  PREFIX.csv       per-cluster size, anchor, mean and max distance
+
+Usage:
+  python3 scripts/installer_routes.py --capacity 25 --out /home/circletel/routes_week
+  python3 scripts/installer_routes.py --clusters 12 --out /home/circletel/territories
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from customer_export import properties
+from customer_index import EARTH_RADIUS_KM, INDEX, CustomerIndex
+from geocode_to_kml import xml_escape
+from kml_writer import KmlWriter
+
+MAX_ITER = 50
+# Stop once no centre moves more than this (km) in an iteration...
+CONVERGED_KM = 0.005
+# ...or, since capacitated assignments keep trading boundary points and the
+# centres never settle, once the total distance to centres has not improved
+# by this share for PATIENCE iterations. The best solution seen is kept.
+IMPROVEMENT = 0.001
+PATIENCE = 3
+PALETTE = ["ff0000ff", "ff00aa00", "ffff0000", "ff00d7ff", "ffff00ff",
+           "ffffff00", "ff0078ff", "ff7f007f", "ff007f7f", "ff7f7f00"]
+
+
+def to_unit(lat, lng):
+    la, lo = np.radians(lat), np.radians(lng)
+    return np.column_stack([np.cos(la) * np.cos(lo), np.cos(la) * np.sin(lo), np.sin(la)])
+
+
+def great_circle_km(a, b):
+    """Pairwise distances between unit vectors a (n, 3) and b (k, 3) → (n, k) km."""
+    return EARTH_RADIUS_KM * np.arccos(np.clip(a @ b.T, -1.0, 1.0))
+
+
+def kmeans_pp(pts, k, rng):
+    """k-means++ seeding on the sphere."""
+    centres = [pts[rng.integers(len(pts))]]
+    d2 = great_circle_km(pts, centres[0][None, :])[:, 0] ** 2
+    for _ in range(1, k):
+        total = d2.sum()
+        i = rng.choice(len(pts), p=d2 / total) if total > 0 else rng.integers(len(pts))
+        centres.append(pts[i])
+        d2 = np.minimum(d2, great_circle_km(pts, pts[i][None, :])[:, 0] ** 2)
+    return np.array(centres)
+
+
+def assign(dist, capacity):
+    """Capacity-constrained assignment from an (n, k) distance matrix.
+
+    Equivalent to placing points one by one in regret order, each on its
+    nearest centre with room, but done in bulk: every point first takes its
+    nearest centre, then centres are closed in the order they fill up and
+    only the points queued past a closed centre's capacity are re-routed to
+    their nearest open one. That is at most k rounds of array operations.
+    """
+    n, k = dist.shape
+    if capacity is None or capacity * k < n:
+        return dist.argmin(axis=1)
+    # Regret: how much worse the second choice is. High-regret points go first.
+    best2 = np.partition(dist, 1, axis=1)[:, :2] if k > 1 else np.zeros((n, 2))
+    queue = np.argsort(-(best2[:, 1] - best2[:, 0]), kind="stable")
+    choice = dist.argmin(axis=1)[queue]
+
+    # Queue positions wanting each centre, and where each one runs out of room
+    by = np.argsort(choice, kind="stable")
+    wanting = np.split(by, np.cumsum(np.bincount(choice, minlength=k))[:-1])
+    fills = np.array([w[capacity - 1] if w.size >= capacity else n for w in wanting])
+    is_open = np.ones(k, dtype=bool)
+    while True:
+        full = fills.argmin()
+        if fills[full] >= n:
+            break
+        is_open[full] = False
+        fills[full] = n
+        moved = wanting[full][capacity:]
+        wanting[full] = wanting[full][:capacity]
+        if not moved.size:
+            continue
+        d = dist[queue[moved]]
+        d[:, ~is_open] = np.inf
+        choice[moved] = d.argmin(axis=1)
+        moved = moved[np.argsort(choice[moved], kind="stable")]
+        targets, starts = np.unique(choice[moved], return_index=True)
+        for c, group in zip(targets.tolist(), np.split(moved, starts[1:])):
+            w = wanting[c] = np.sort(np.concatenate([wanting[c], group]))
+            fills[c] = w[capacity - 1] if w.size >= capacity else n
+
+    labels = np.empty(n, dtype=np.int64)
+    labels[queue] = choice
+    return labels
+
+
+def cluster(lat, lng, k, capacity=None, max_iter=MAX_ITER, seed=0):
+    """Return (labels, centroids (k, 3), iterations)."""
+    pts = to_unit(lat, lng)
+    rng = np.random.default_rng(seed)
+    centres = kmeans_pp(pts, k, rng)
+    best = None         # (total km, labels, centres) of the best iteration
+    stale = 0
+    it = 0
+    for it in range(1, max_iter + 1):
+        dist = great_circle_km(pts, centres)
+        labels = assign(dist, capacity)
+        total = dist[np.arange(len(pts)), labels].sum()
+        if best is None or total < best[0]:
+            stale = 0 if best is None or total < best[0] * (1 - IMPROVEMENT) else stale + 1
+            best = (total, labels, centres)
+        else:
+            stale += 1
+        if stale >= PATIENCE:
+            break
+        sums = np.zeros((k, 3))
+        np.add.at(sums, labels, pts)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        # Re-seed empty clusters on the point farthest from its centre.
+        if empty.any():
+            far = np.argsort(-dist[np.arange(len(pts)), labels])
+            sums[empty] = pts[far[:empty.sum()]]
+            norms[empty] = 1.0
+        moved = sums / norms
+        shift = EARTH_RADIUS_KM * np.arccos(np.clip(np.einsum("ij,ij->i", moved, centres), -1, 1)).max()
+        centres = moved
+        if shift < CONVERGED_KM:
+            break
+    if best is None:
+        return assign(great_circle_km(pts, centres), capacity), centres, it
+    return best[1], best[2], it
+
+
+def summarize(lat, lng, labels, centres):
+    """Per cluster: (size, anchor index, mean km, max km)."""
+    pts = to_unit(lat, lng)
+    d = EARTH_RADIUS_KM * np.arccos(np.clip(np.einsum("ij,ij->i", pts, centres[labels]), -1, 1))
+    out = []
+    for c in range(len(centres)):
+        members = np.flatnonzero(labels == c)
+        if not members.size:
+            out.append((0, None, 0.0, 0.0))
+            continue
+        anchor = members[d[members].argmin()]
+        out.append((members.size, int(anchor), float(d[members].mean()), float(d[members].max())))
+    return out
+
+
+def cluster_styles(k):
+    lines = []
+    for c in range(k):
+        colour = PALETTE[c % len(PALETTE)]
+        lines.append(f"""  <Style id="k{c}">
+    <IconStyle>
+      <color>{colour}</color>
+      <Icon><href>http://maps.google.com/mapfiles/kml/paddle/wht-blank.png</href></Icon>
+    </IconStyle>
+    <LabelStyle><scale>0.6</scale></LabelStyle>
+  </Style>
+  <Style id="a{c}">
+    <IconStyle>
+      <color>{colour}</color>
+      <scale>1.4</scale>
+      <Icon><href>http://maps.google.com/mapfiles/kml/paddle/wht-stars.png</href></Icon>
+    </IconStyle>
+  </Style>""")
+    return "\n".join(lines)
+
+
+def placemark(c, style):
+    desc = (
+        f"<![CDATA["
+        f"<b>Account:</b> {xml_escape(c['account'] or '—')}<br/>"
+        f"<b>Package:</b> {xml_escape(c['package'] or '—')}<br/>"
+        f"<b>Monthly fee:</b> {xml_escape(c['monthly_fee'] or '—')}<br/>"
+        f"<b>Address:</b> {xml_escape(c['address'])}"
+        f"]]>"
+    )
+    return (
+        f"    <Placemark>\n"
+        f"      <name>{xml_escape(c['account'])}</name>\n"
+        f"      <styleUrl>#{style}</styleUrl>\n"
+        f"      <description>{desc}</description>\n"
+        f"      <Point><coordinates>{c['lng']},{c['lat']},0</coordinates></Point>\n"
+        f"    </Placemark>"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Balanced installer territories / route batches")
+    parser.add_argument("--db", type=Path, default=INDEX, help=f"customer index (default: {INDEX})")
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument("--clusters", type=int, help="number of territories")
+    size.add_argument("--capacity", type=int, help="max customers per batch (clusters = ceil(n / capacity))")
+    parser.add_argument("--balance", action="store_true",
+                        help="with --clusters: cap every territory at ceil(n / clusters) customers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, default=Path("routes"), help="output prefix (default: ./routes)")
+    args = parser.parse_args()
+    if args.capacity is not None and args.capacity < 1:
+        parser.error("--capacity must be at least 1")
+    if args.clusters is not None and args.clusters < 1:
+        parser.error("--clusters must be at least 1")
+
+    if not args.db.exists():
+        sys.exit(f"ERROR: no index at {args.db}. Build it with: python3 scripts/geocode_to_kml.py --index")
+    customers = CustomerIndex(args.db).all()
+    n = len(customers)
+    if not n:
+        sys.exit("ERROR: the customer index is empty")
+    lat = np.array([c["lat"] for c in customers])
+    lng = np.array([c["lng"] for c in customers])
+
+    if args.capacity is not None:
+        k = -(-n // args.capacity)
+        capacity = args.capacity
+    else:
+        k = min(args.clusters, n)
+        capacity = -(-n // k) if args.balance else None
+
+    started = time.perf_counter()
+    labels, centres, iterations = cluster(lat, lng, k, capacity, seed=args.seed)
+    stats = summarize(lat, lng, labels, centres)
+    elapsed = time.perf_counter() - started
+
+    names = [f"Cluster {c + 1:02d}" for c in range(k)]
+    anchors = {s[1] for s in stats if s[1] is not None}
+    with KmlWriter(args.out.with_suffix(".kml"), names, name="CircleTel Installer Clusters",
+                   description=f"{k} clusters of ≤{capacity or 'any'} customers",
+                   styles=cluster_styles(k)) as kml:
+        for i, (c, label) in enumerate(zip(customers, labels.tolist())):
+            kml.add(names[label], placemark(c, f"{'a' if i in anchors else 'k'}{label}"))
+
+    features = [{
+        "type": "Feature",
+        "id": c["id"],
+        "geometry": {"type": "Point", "coordinates": [round(c["lng"], 6), round(c["lat"], 6)]},
+        "properties": {"cluster": label + 1, "anchor": i in anchors, **properties(c)},
+    } for i, (c, label) in enumerate(zip(customers, labels.tolist()))]
+    args.out.with_suffix(".geojson").write_text(
+        json.dumps({"type": "FeatureCollection", "features": features}, ensure_ascii=False))
+
+    with open(args.out.with_suffix(".csv"), "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["cluster", "customers", "anchor_account", "anchor_lat", "anchor_lng",
+                    "mean_km_to_centre", "max_km_to_centre"])
+        for name, (size, anchor, mean_km, max_km) in zip(names, stats):
+            a = customers[anchor] if anchor is not None else {}
+            w.writerow([name, size, a.get("account"), a.get("lat"), a.get("lng"),
+                        round(mean_km, 2), round(max_km, 2)])
+
+    sizes = [s[0] for s in stats]
+    print(f"Clustered {n} customers into {k} clusters in {elapsed:.2f}s ({iterations} iterations)")
+    print(f"  Size: min {min(sizes)}, max {max(sizes)}"
+          + (f" (capacity {capacity})" if capacity else ""))
+    print(f"  Mean distance to centre: {np.mean([s[2] for s in stats if s[0]]):.1f} km")
+    print(f"Written → {args.out.with_suffix('.kml')}, .geojson, .csv")
+
+
+if __name__ == "__main__":
+    main()
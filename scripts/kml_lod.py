@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Level-of-detail ("super-overlay") KML for the customer map.
+
+Geocoded points are bucketed into a lat/lng quadtree. Every tile file holds,
+for each of its non-empty child quadrants, a cluster placemark (customer
+count plus tier mix) visible while the quadrant is small on screen, and a
+`NetworkLink` to the child tile that only loads once its `Region` is at
+least `lod_pixels` across. Leaf tiles (≤ `leaf_size` points, or at
+`max_depth`) hold the individual customer placemarks. Google Earth and
+browser viewers therefore only ever draw a few hundred features at a time.
+
+Output is a directory (doc.kml + tiles/*.kml) or, with `kmz=True`, the same
+tree zipped into one .kmz.
+"""
+
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import Counter
+from pathlib import Path
+
+from kml_writer import FOOTER, HEADER
+
+LEAF_SIZE = 250
+MAX_DEPTH = 14
+LOD_PIXELS = 256
+# A node whose points all share one quadrant and lie within this span
+# (~0.1 m) is one spot (e.g. a block of flats): halving it further would
+# only add a chain of single-child tiles down to max_depth.
+MIN_SPAN = 1e-6
+
+CLUSTER_ICON = "http://maps.google.com/mapfiles/kml/shapes/placemark_circle.png"
+
+
+class QuadNode:
+    __slots__ = ("key", "south", "west", "north", "east", "points", "children")
+
+    def __init__(self, key, south, west, north, east, points):
+        self.key = key
+        self.south, self.west, self.north, self.east = south, west, north, east
+        self.points = points
+        self.children = []
+
+    @property
+    def is_leaf(self):
+        return not self.children
+
+
+def build_quadtree(points, leaf_size=LEAF_SIZE, max_depth=MAX_DEPTH):
+    """Split `points` ((lat, lng, tier, style_id, placemark_xml) tuples) into a quadtree."""
+    lats = [p[0] for p in points]
+    lngs = [p[1] for p in points]
+    root = QuadNode("0", min(lats), min(lngs), max(lats), max(lngs), points)
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if len(node.points) <= leaf_size or depth >= max_depth:
+            continue
+        mid_lat = (node.south + node.north) / 2
+        mid_lng = (node.west + node.east) / 2
+        quads = [[], [], [], []]
+        for p in node.points:
+            quads[(p[0] >= mid_lat) * 2 + (p[1] >= mid_lng)].append(p)
+        if max(map(len, quads)) == len(node.points) and _span(node.points) < MIN_SPAN:
+            continue
+        bounds = [
+            (node.south, node.west, mid_lat, mid_lng),
+            (node.south, mid_lng, mid_lat, node.east),
+            (mid_lat, node.west, node.north, mid_lng),
+            (mid_lat, mid_lng, node.north, node.east),
+        ]
+        for i, (quad, (s, w, n, e)) in enumerate(zip(quads, bounds)):
+            if quad:
+                child = QuadNode(node.key + str(i), s, w, n, e, quad)
+                node.children.append(child)
+                stack.append((child, depth + 1))
+        node.points = None  # only leaves keep their points
+    return root
+
+
+def _span(points):
+    lats = [p[0] for p in points]
+    lngs = [p[1] for p in points]
+    return max(max(lats) - min(lats), max(lngs) - min(lngs))
+
+
+def _iter_points(node):
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        if n.is_leaf:
+            yield from n.points
+        else:
+            stack.extend(n.children)
+
+
+def _region(node, min_px, max_px):
+    # Pad degenerate boxes (all points on one spot) so viewers can size them.
+    pad = 1e-4
+    return (
+        f"      <Region>\n"
+        f"        <LatLonAltBox>"
+        f"<north>{node.north + pad}</north><south>{node.south - pad}</south>"
+        f"<east>{node.east + pad}</east><west>{node.west - pad}</west>"
+        f"</LatLonAltBox>\n"
+        f"        <Lod><minLodPixels>{min_px}</minLodPixels>"
+        f"<maxLodPixels>{max_px}</maxLodPixels></Lod>\n"
+        f"      </Region>\n"
+    )
+
+
+def cluster_styles(style_ids):
+    lines = []
+    for sid, colour in style_ids.items():
+        lines.append(f"""  <Style id="c{sid}">
+    <IconStyle>
+      <color>{colour}</color>
+      <scale>1.6</scale>
+      <Icon><href>{CLUSTER_ICON}</href></Icon>
+    </IconStyle>
+    <LabelStyle><scale>0.9</scale></LabelStyle>
+  </Style>""")
+    return "\n".join(lines)
+
+
+def _cluster_placemark(node, tier_order, lod_pixels):
+    pts = list(_iter_points(node))
+    lat = sum(p[0] for p in pts) / len(pts)
+    lng = sum(p[1] for p in pts) / len(pts)
+    tiers = Counter(p[2] for p in pts)
+    styles = Counter(p[3] for p in pts)
+    mix = "<br/>".join(f"<b>{t}:</b> {tiers[t]}" for t in tier_order if tiers.get(t))
+    return (
+        f"  <Folder>\n"
+        + _region(node, 0, lod_pixels * 2)
+        + f"    <Placemark>\n"
+        f"      <name>{len(pts)}</name>\n"
+        f"      <styleUrl>#c{styles.most_common(1)[0][0]}</styleUrl>\n"
+        f"      <description><![CDATA[<b>{len(pts)} customers</b><br/>{mix}]]></description>\n"
+        f"      <Point><coordinates>{lng},{lat},0</coordinates></Point>\n"
+        f"    </Placemark>\n"
+        f"  </Folder>\n"
+    )
+
+
+def _network_link(node, href, lod_pixels):
+    return (
+        f"  <NetworkLink>\n"
+        f"    <name>{node.key}</name>\n"
+        + _region(node, lod_pixels, -1)
+        + f"    <Link><href>{href}</href><viewRefreshMode>onRegion</viewRefreshMode></Link>\n"
+        f"  </NetworkLink>\n"
+    )
+
+
+def _write_node(out, node, styles, tier_order, lod_pixels, href_prefix, name="", description=""):
+    out.write(HEADER)
+    if name:
+        out.write(f"  <name>{name}</name>\n")
+    if description:
+        out.write(f"  <description>{description}</description>\n")
+    out.write(styles + "\n")
+    if node.is_leaf:
+        for p in node.points:
+            out.write(p[4] + "\n")
+    else:
+        for child in node.children:
+            out.write(_cluster_placemark(child, tier_order, lod_pixels))
+            out.write(_network_link(child, f"{href_prefix}{child.key}.kml", lod_pixels))
+    out.write(FOOTER)
+
+
+def write_lod(path, points, style_ids, tier_order, name="", description="",
+              leaf_size=LEAF_SIZE, max_depth=MAX_DEPTH, lod_pixels=LOD_PIXELS,
+              base_styles="", kmz=False):
+    """Write the quadtree super-overlay; returns (tile_count, leaf_count, depth)."""
+    if not points:
+        raise ValueError("no geocoded points to write")
+    root = build_quadtree(points, leaf_size=leaf_size, max_depth=max_depth)
+    styles = base_styles + "\n" + cluster_styles(style_ids) if base_styles else cluster_styles(style_ids)
+
+    path = Path(path)
+    staging = Path(tempfile.mkdtemp(prefix="kml_lod_", dir=path.parent))
+    tiles = leaves = depth = 0
+    try:
+        (staging / "tiles").mkdir()
+        with open(staging / "doc.kml", "w", encoding="utf-8") as out:
+            _write_node(out, root, styles, tier_order, lod_pixels, "tiles/",
+                        name=name, description=description)
+        # Tile files link to their siblings in the same directory.
+        stack = list(root.children)
+        while stack:
+            node = stack.pop()
+            tiles += 1
+            leaves += node.is_leaf
+            depth = max(depth, len(node.key) - 1)
+            with open(staging / "tiles" / f"{node.key}.kml", "w", encoding="utf-8") as out:
+                _write_node(out, node, styles, tier_order, lod_pixels, "")
+            stack.extend(node.children)
+
+        if kmz:
+            tmp = str(path) + ".tmp"
+            try:
+                with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                    zf.write(staging / "doc.kml", "doc.kml")  # must be the first entry
+                    for tile in sorted((staging / "tiles").iterdir()):
+                        zf.write(tile, f"tiles/{tile.name}")
+                os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        else:
+            if path.exists():
+                shutil.rmtree(path)
+            os.replace(staging, path)
+    finally:
+        if staging.exists():
+            shutil.rmtree(staging)
+    return tiles, leaves, depth
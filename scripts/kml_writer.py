@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Streaming KML / KMZ writer for the customer map (geocode_to_kml.py).
+
+Placemarks are written to one temporary spool file per folder as they are
+produced, so memory stays flat regardless of customer count. On close the
+document header, styles and each folder (with its final count in the name)
+are streamed in order into the output — a plain .kml file, or a zipped
+.kmz (doc.kml inside) when `kmz=True`.
+
+    with KmlWriter(path, folders, name=..., styles=...) as kml:
+        kml.add(folder_name, placemark_xml)
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+
+HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<kml xmlns="http://www.opengis.net/kml/2.2">\n'
+    '<Document>\n'
+)
+FOOTER = '</Document>\n</kml>\n'
+
+
+class KmlWriter:
+    def __init__(self, path, folders, name="", description="", styles="", kmz=False,
+                 folder_label="customers"):
+        self.path = str(path)
+        self.folders = list(folders)
+        self.name = name
+        self.description = description
+        self.styles = styles
+        self.kmz = kmz
+        self.folder_label = folder_label
+        self.counts = {f: 0 for f in self.folders}
+        self._spools = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._discard()
+
+    def _spool(self, folder):
+        spool = self._spools.get(folder)
+        if spool is None:
+            spool = tempfile.TemporaryFile("w+", encoding="utf-8")
+            self._spools[folder] = spool
+        return spool
+
+    def add(self, folder, placemark):
+        """Append one <Placemark> (already serialised) to `folder`."""
+        if folder not in self.counts:
+            self.folders.append(folder)
+            self.counts[folder] = 0
+        self._spool(folder).write(placemark + "\n")
+        self.counts[folder] += 1
+
+    def _write_document(self, out):
+        out.write(HEADER)
+        if self.name:
+            out.write(f"  <name>{self.name}</name>\n")
+        if self.description:
+            out.write(f"  <description>{self.description}</description>\n")
+        if self.styles:
+            out.write(self.styles + "\n")
+        for folder in self.folders:
+            spool = self._spools.get(folder)
+            if spool is None:
+                continue
+            out.write(
+                f"  <Folder>\n"
+                f"    <name>{folder} ({self.counts[folder]} {self.folder_label})</name>\n"
+                f"    <open>0</open>\n"
+            )
+            spool.seek(0)
+            shutil.copyfileobj(spool, out)
+            out.write("  </Folder>\n")
+        out.write(FOOTER)
+
+    def close(self):
+        # Write to a sibling temp file first so a failed run never leaves a
+        # truncated map in place of the previous one.
+        tmp = self.path + ".tmp"
+        try:
+            if self.kmz:
+                with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                    with zf.open("doc.kml", "w") as raw:
+                        with io.TextIOWrapper(raw, encoding="utf-8") as out:
+                            self._write_document(out)
+            else:
+                with open(tmp, "w", encoding="utf-8") as out:
+                    self._write_document(out)
+            os.replace(tmp, self.path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            self._discard()
+
+    def _discard(self):
+        for spool in self._spools.values():
+            spool.close()
+        self._spools.clear()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Streaming reader for the MTN Helios/iLula deals sheet.
+
+excel-to-json.py writes {"filename", "sheets", "data": {sheet: {"rows",
+"columns", "data": [deal, ...]}}}. iter_deals() walks that document
+incrementally and yields the deal dicts one at a time straight out of the
+sheet's "data" array, so callers start work on the first deal without
+loading the whole file; anything it does not need (other sheets, the
+column list) is decoded and dropped as it goes. Newline-delimited files
+(.jsonl, one deal per line) are read line by line, and .xlsx workbooks
+are streamed row by row (python-calamine, else openpyxl read-only) into
+the same dicts excel-to-json.py would have written.
+
+Usage:
+  python3 scripts/mtn_deals.py count
+  python3 scripts/mtn_deals.py count "Helios and iLula Business Promos - Nov 2025 - Deals.xlsx"
+  python3 scripts/mtn_deals.py to-jsonl deals.json deals.jsonl
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+DEALS_JSON = Path('docs/products/01_ACTIVE_PRODUCTS/MTN Deals/Oct-2025/'
+                  'Helios and iLula Business Promos - Oct 2025 - Deals.json')
+SHEET = 'Sheet1'
+CHUNK = 1 << 20
+WHITESPACE = ' \t\n\r'
+
+# Cell text pandas reads as missing; excel-to-json.py writes these as ''.
+NA_STRINGS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+_decoder = json.JSONDecoder()
+
+_DATA_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(TB|GB|MB)(?!ps)', re.IGNORECASE)
+_DATA_UNITS = {'tb': 1000.0, 'gb': 1.0, 'mb': 0.001}
+_MINUTES_RE = re.compile(r'(\d+)\s*min', re.IGNORECASE)
+
+
+class _Stream:
+    """A text file consumed through a sliding buffer."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(CHUNK)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character ('' at end of file)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos}, found {self.peek()!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number that ends the buffer may continue in the next chunk.
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def _descend(stream, path):
+    """Advance into the value at `path` (a list of object keys)."""
+    for key in path:
+        stream.expect('{')
+        while True:
+            if stream.peek() == '}':
+                raise KeyError(key)
+            name = stream.value()
+            stream.expect(':')
+            if name == key:
+                break
+            stream.value()
+            if stream.peek() == ',':
+                stream.pos += 1
+
+
+def _iter_array(stream):
+    stream.expect('[')
+    if stream.peek() == ']':
+        return
+    while True:
+        yield stream.value()
+        if stream.peek() == ',':
+            stream.pos += 1
+        else:
+            stream.expect(']')
+            return
+
+
+def _cell(value):
+    """A workbook cell as excel-to-json.py would write it."""
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value.strip() in NA_STRINGS:
+        return ''
+    return value
+
+
+def _xlsx_rows(path, sheet):
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError:
+        import openpyxl
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        ws = wb[sheet] if sheet in wb.sheetnames else wb.worksheets[0]
+        try:
+            yield from ws.iter_rows(values_only=True)
+        finally:
+            wb.close()
+        return
+    wb = CalamineWorkbook.from_path(str(path))
+    name = sheet if sheet in wb.sheet_names else wb.sheet_names[0]
+    yield from wb.get_sheet_by_name(name).iter_rows()
+
+
+def iter_xlsx_deals(path, sheet=SHEET):
+    """Yield deal dicts straight from a workbook (the sheet, else the first)."""
+    rows = _xlsx_rows(path, sheet)
+    header = [str(h) for h in next(rows, [])]
+    for row in rows:
+        values = [_cell(v) for v in row]
+        if any(v != '' for v in values):
+            yield dict(zip(header, values))
+
+
+def iter_deals(path=DEALS_JSON, sheet=SHEET):
+    """Yield deal dicts from an excel-to-json.py document, a JSONL file or
+    the .xlsx workbook itself.
+
+    A JSON file that is a bare top-level array is also accepted.
+    """
+    path = Path(path)
+    if path.suffix.lower() in ('.xlsx', '.xlsm'):
+        yield from iter_xlsx_deals(path, sheet)
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.suffix.lower() in ('.jsonl', '.ndjson'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        stream = _Stream(f)
+        if stream.peek() != '[':
+            _descend(stream, ['data', sheet, 'data'])
+        yield from _iter_array(stream)
+
+
+def parse_data_gb(text):
+    """Headline data allowance in GB from 'Total Data' text.
+
+    Bundles read like '120GB Work Express + 150GB anytime + 230GB' or
+    '1.5TB (FUP) + Best Effort Mbps'; the largest quantity is the headline
+    allowance. 0.0 when nothing parses.
+    """
+    quantities = [float(n) * _DATA_UNITS[u.lower()]
+                  for n, u in _DATA_RE.findall(str(text or ''))]
+    return max(quantities, default=0.0)
+
+
+def parse_minutes(text):
+    """Anytime minutes from 'Total Minutes' text ('1000min + 500min on-net' → 1000)."""
+    m = _MINUTES_RE.search(str(text or ''))
+    return int(m.group(1)) if m else 0
+
+
+def write_jsonl(deals, path):
+    """Write deals one per line; returns the count."""
+    n = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for deal in deals:
+            f.write(json.dumps(deal, ensure_ascii=False, separators=(',', ':')) + '\n')
+            n += 1
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream MTN deals from the deals JSON / JSONL')
+    parser.add_argument('--sheet', default=SHEET, help=f'sheet name (default: {SHEET})')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    c = sub.add_parser('count', help='count deals')
+    c.add_argument('input', nargs='?', type=Path, default=DEALS_JSON)
+    j = sub.add_parser('to-jsonl', help='convert the deals JSON / workbook to one deal per line')
+    j.add_argument('input', type=Path)
+    j.add_argument('output', type=Path)
+    args = parser.parse_args()
+
+    if not args.input.exists():
+        sys.exit(f"ERROR: {args.input} not found")
+    started = time.perf_counter()
+    if args.cmd == 'count':
+        n = sum(1 for _ in iter_deals(args.input, args.sheet))
+        print(f"{n:,} deals in {args.input} ({time.perf_counter() - started:.2f}s)")
+    else:
+        n = write_jsonl(iter_deals(args.input, args.sheet), args.output)
+        print(f"✓ Wrote {n:,} deals → {args.output} ({time.perf_counter() - started:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Fuzzy matching of MTN price plan names to service_packages rows.
+
+Product names are broken into features — normalised word tokens plus
+character trigrams, so "Made For Business SM" still finds "MTN Made for
+Business S/M" — weighted by TF-IDF and held in an inverted index
+(feature → packages). A query collects candidates from the postings of
+its selective features only (those in at most MAX_DF of the names;
+"business" or "bus" would otherwise drag in everything) and scores just
+those candidates by exact cosine similarity, so the cost grows with the
+number of plausible candidates rather than with every plan × package
+pair.
+
+compare-mtn-products.py --match uses this to link every unique Price Plan
+in the deals sheet to its best service_packages candidates.
+
+Usage:
+  python3 scripts/package_matcher.py packages.json "Made For Business SM" -k 5
+"""
+
+import argparse
+import json
+import math
+import re
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+# Words that appear in nearly every name and carry no signal
+STOPWORDS = frozenset({'mtn', 'the', 'and', 'for', 'of', 'plan', 'package'})
+TOKEN_WEIGHT = 1.0
+TRIGRAM_WEIGHT = 0.5
+# Features in more than this share of names are too common to nominate candidates
+MAX_DF = 0.1
+
+
+def tokens(name):
+    name = str(name).lower().replace('+', ' plus ')
+    # "S/M" and "SM" are the same size code
+    name = re.sub(r'\b([a-z])/([a-z])\b', r'\1\2', name)
+    words = re.findall(r'[a-z0-9]+(?:\.[0-9]+)?', name)
+    return [w for w in words if w not in STOPWORDS]
+
+
+def features(name):
+    """{feature: raw weight}: word tokens and character trigrams of each token."""
+    feats = defaultdict(float)
+    for word in tokens(name):
+        feats['w:' + word] += TOKEN_WEIGHT
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            feats['g:' + padded[i:i + 3]] += TRIGRAM_WEIGHT
+    return feats
+
+
+class PackageIndex:
+    """TF-IDF inverted index over product names."""
+
+    def __init__(self, products, key='name', max_df=MAX_DF):
+        self.products = list(products)
+        self.key = key
+        docs = [features(p.get(key) or '') for p in self.products]
+        df = defaultdict(int)
+        for feats in docs:
+            for f in feats:
+                df[f] += 1
+        n = len(docs)
+        self.idf = {f: math.log((1 + n) / (1 + c)) + 1 for f, c in df.items()}
+        self.common = {f for f, c in df.items() if c > max(1, max_df * n)}
+        self.postings = defaultdict(list)
+        self.vectors = []
+        for pid, feats in enumerate(docs):
+            vec = {f: w * self.idf[f] for f, w in feats.items()}
+            norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+            self.vectors.append({f: v / norm for f, v in vec.items()})
+            for f in feats:
+                self.postings[f].append(pid)
+
+    def match(self, name, k=5, min_score=0.1):
+        """[(score, product)] for the k best candidates, best first."""
+        feats = features(name)
+        vec = {f: w * self.idf[f] for f, w in feats.items() if f in self.idf}
+        norm = math.sqrt(sum(v * v for v in vec.values()))
+        if not norm:
+            return []
+        vec = {f: v / norm for f, v in vec.items()}
+        selective = [f for f in vec if f not in self.common] or list(vec)
+        candidates = set()
+        for f in selective:
+            candidates.update(self.postings[f])
+        scored = []
+        for pid in candidates:
+            doc = self.vectors[pid]
+            score = sum(v * doc[f] for f, v in vec.items() if f in doc)
+            if score >= min_score:
+                scored.append((score, pid))
+        best = sorted(scored, reverse=True)[:k]
+        return [(round(s, 4), self.products[pid]) for s, pid in best]
+
+    def match_all(self, names, k=5, min_score=0.1):
+        """{name: [(score, product)]} for every name."""
+        return {name: self.match(name, k, min_score) for name in names}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Match names against a JSON list of products')
+    parser.add_argument('products', type=Path, help='JSON array of product objects')
+    parser.add_argument('names', nargs='+', help='names to match')
+    parser.add_argument('-k', type=int, default=5, help='candidates per name (default: 5)')
+    parser.add_argument('--key', default='name', help='product field holding the name (default: name)')
+    args = parser.parse_args()
+
+    if not args.products.exists():
+        sys.exit(f"ERROR: {args.products} not found")
+    index = PackageIndex(json.loads(args.products.read_text(encoding='utf-8')), args.key)
+    for name, hits in index.match_all(args.names, args.k).items():
+        print(name)
+        for score, product in hits:
+            print(f"  {score:.3f}  {product.get(args.key)}")
+        if not hits:
+            print("  (no candidates)")
+
+
+if __name__ == '__main__':
+    main()
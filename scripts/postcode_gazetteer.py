@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Offline South African postal-code / suburb gazetteer for geocode_to_kml.py.
+
+Almost every contract address ends in a 4-digit postal code, which is
+enough to place a customer on a map without calling the Google API. The
+gazetteer is a small SQLite database of place centroids:
+
+  places            (postal_code, suburb, city, lat, lng, source)
+  postal_centroids  (postal_code → mean lat/lng of its places)
+
+Lookups return (lat, lng, precision) where precision is "suburb" when the
+address names a suburb listed under its postal code (or, without a code,
+an unambiguous suburb), and "postal_code" when only the code matched.
+
+Build it from a GeoNames postal-code dump (ZA.txt from
+https://download.geonames.org/export/zip/), a CSV with columns
+postal_code,suburb,city,lat,lng, and/or the street-level results already
+in the geocode cache:
+
+  python3 scripts/postcode_gazetteer.py build --geonames ZA.txt
+  python3 scripts/postcode_gazetteer.py build --csv suburbs.csv --from-cache
+  python3 scripts/postcode_gazetteer.py lookup "12 Main Rd, Sandton, 2196"
+"""
+
+import argparse
+import csv
+import re
+import sqlite3
+import sys
+from pathlib import Path
+
+BASE = Path("/home/circletel")
+GAZETTEER = BASE / "za_gazetteer.sqlite"
+GEOCODE_CACHE = BASE / "contracts_geocode_cache.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS places (
+    postal_code TEXT NOT NULL,
+    suburb      TEXT NOT NULL,
+    suburb_key  TEXT NOT NULL,
+    city        TEXT,
+    lat         REAL NOT NULL,
+    lng         REAL NOT NULL,
+    source      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_places_postal ON places(postal_code);
+CREATE INDEX IF NOT EXISTS idx_places_suburb ON places(suburb_key);
+
+CREATE TABLE IF NOT EXISTS postal_centroids (
+    postal_code TEXT PRIMARY KEY,
+    lat         REAL NOT NULL,
+    lng         REAL NOT NULL,
+    places      INTEGER NOT NULL
+);
+"""
+
+POSTAL_RE = re.compile(r"(?<!\d)(\d{4})(?!\d)")
+CODE_ONLY_RE = re.compile(r"\d{4}")
+STREET_NUMBER_RE = re.compile(r"\d+[a-z]?\b")
+_WS_RE = re.compile(r"\s+")
+
+# Only street-level cache results are good enough to seed centroids.
+CACHE_PRECISIONS = {"rooftop", "street", None}
+
+
+def place_key(name):
+    """Match key for suburb names: case, whitespace and edge punctuation folded."""
+    return _WS_RE.sub(" ", str(name or "")).strip(" .,;").casefold()
+
+
+def split_address(address):
+    """Return (parts, postal_code) for a comma-separated address."""
+    parts = [place_key(p) for p in str(address or "").split(",")]
+    parts = [p for p in parts if p]
+    code = None
+    # A postal code is a part of its own ("..., Sandton, 2196") or trails the
+    # last part ("..., Sandton 2196"). A part that starts with a number is a
+    # street address, so "1234 Main Rd" never yields a code.
+    for part in reversed(parts):
+        if CODE_ONLY_RE.fullmatch(part):
+            code = part
+            break
+    else:
+        if parts and not STREET_NUMBER_RE.match(parts[-1]):
+            found = POSTAL_RE.findall(parts[-1])
+            code = found[-1] if found else None
+    return parts, code
+
+
+class Gazetteer:
+    """In-memory view of the gazetteer tables for fast repeated lookups."""
+
+    def __init__(self, path=GAZETTEER):
+        conn = sqlite3.connect(str(path))
+        self.by_code = {}      # postal_code → {suburb_key: (lat, lng)}
+        self.by_suburb = {}    # suburb_key → {postal_code: (lat, lng)}
+        self.centroids = {}    # postal_code → (lat, lng)
+        for code, key, lat, lng in conn.execute(
+                "SELECT postal_code, suburb_key, AVG(lat), AVG(lng) FROM places "
+                "GROUP BY postal_code, suburb_key"):
+            self.by_code.setdefault(code, {})[key] = (lat, lng)
+            self.by_suburb.setdefault(key, {})[code] = (lat, lng)
+        for code, lat, lng in conn.execute("SELECT postal_code, lat, lng FROM postal_centroids"):
+            self.centroids[code] = (lat, lng)
+        conn.close()
+
+    def __len__(self):
+        return len(self.centroids)
+
+    def lookup(self, address):
+        """Return (lat, lng, precision) or None."""
+        parts, code = split_address(address)
+        if code and code in self.centroids:
+            suburbs = self.by_code.get(code, {})
+            for part in reversed(parts):
+                if part in suburbs:
+                    lat, lng = suburbs[part]
+                    return lat, lng, "suburb"
+            lat, lng = self.centroids[code]
+            return lat, lng, "postal_code"
+        # No usable code: accept a suburb name only if it is unambiguous.
+        for part in reversed(parts):
+            spots = self.by_suburb.get(part)
+            if spots and len(spots) == 1:
+                lat, lng = next(iter(spots.values()))
+                return lat, lng, "suburb"
+        return None
+
+
+# ── building ──────────────────────────────────────────────────────────────────
+def read_geonames(path):
+    """Rows from a GeoNames postal-code dump (tab-separated, no header)."""
+    with open(path, encoding="utf-8") as f:
+        for cols in csv.reader(f, delimiter="\t"):
+            if len(cols) < 11 or not cols[9] or not cols[10]:
+                continue
+            yield cols[1].zfill(4), cols[2], cols[5] or cols[3], float(cols[9]), float(cols[10])
+
+
+def read_csv(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            if not row.get("lat") or not row.get("lng"):
+                continue
+            yield (str(row["postal_code"]).zfill(4), row["suburb"], row.get("city") or None,
+                   float(row["lat"]), float(row["lng"]))
+
+
+def read_geocode_cache(path):
+    """Suburb centroids learned from street-level results in the geocode cache."""
+    from geocode_cache import GeocodeCache
+
+    sums = {}
+    for address, lat, lng, precision in GeocodeCache(path).iter_ok():
+        if precision not in CACHE_PRECISIONS:
+            continue
+        parts, code = split_address(address)
+        if not code or len(parts) < 2:
+            continue
+        # The suburb is normally the part just before the one holding the code.
+        idx = max(i for i, p in enumerate(parts) if code in p)
+        suburb = parts[idx - 1] if idx > 0 else parts[idx]
+        acc = sums.setdefault((code, suburb), [0.0, 0.0, 0])
+        acc[0] += lat
+        acc[1] += lng
+        acc[2] += 1
+    for (code, suburb), (slat, slng, n) in sums.items():
+        yield code, suburb, None, slat / n, slng / n
+
+
+def build(path, sources):
+    conn = sqlite3.connect(str(path))
+    conn.executescript(SCHEMA)
+    with conn:
+        for source, rows in sources:
+            conn.execute("DELETE FROM places WHERE source = ?", (source,))
+            conn.executemany(
+                "INSERT INTO places (postal_code, suburb, suburb_key, city, lat, lng, source) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((code, suburb, place_key(suburb), city, lat, lng, source)
+                 for code, suburb, city, lat, lng in rows),
+            )
+        conn.execute("DELETE FROM postal_centroids")
+        conn.execute(
+            "INSERT INTO postal_centroids (postal_code, lat, lng, places) "
+            "SELECT postal_code, AVG(lat), AVG(lng), COUNT(*) FROM places GROUP BY postal_code")
+    places = conn.execute("SELECT COUNT(*) FROM places").fetchone()[0]
+    codes = conn.execute("SELECT COUNT(*) FROM postal_centroids").fetchone()[0]
+    conn.close()
+    return places, codes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline postal-code gazetteer")
+    parser.add_argument("--db", type=Path, default=GAZETTEER, help=f"gazetteer database (default: {GAZETTEER})")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="(re)load place centroids")
+    b.add_argument("--geonames", type=Path, help="GeoNames postal-code dump (ZA.txt)")
+    b.add_argument("--csv", type=Path, help="CSV with postal_code,suburb,city,lat,lng")
+    b.add_argument("--from-cache", nargs="?", type=Path, const=GEOCODE_CACHE,
+                   help=f"learn suburb centroids from the geocode cache (default: {GEOCODE_CACHE})")
+
+    q = sub.add_parser("lookup", help="resolve addresses offline")
+    q.add_argument("address", nargs="+")
+
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        sources = []
+        if args.geonames:
+            sources.append(("geonames", read_geonames(args.geonames)))
+        if args.csv:
+            sources.append(("csv", read_csv(args.csv)))
+        if args.from_cache:
+            sources.append(("geocode_cache", read_geocode_cache(args.from_cache)))
+        if not sources:
+            sys.exit("ERROR: give at least one of --geonames, --csv, --from-cache")
+        places, codes = build(args.db, sources)
+        print(f"Gazetteer built → {args.db}: {places} places, {codes} postal codes")
+        return
+
+    gaz = Gazetteer(args.db)
+    for address in args.address:
+        hit = gaz.lookup(address)
+        if hit:
+            print(f"{address}\n  → {hit[0]:.5f}, {hit[1]:.5f}  [{hit[2]}]")
+        else:
+            print(f"{address}\n  → not found")
+
+
+if __name__ == "__main__":
+    main()
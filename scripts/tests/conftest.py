@@ -0,0 +1,14 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+SCRIPTS = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS))
+
+
+def load_script(name):
+    """Import a hyphenated script (e.g. import-mtn-deals.py) as a module."""
+    spec = importlib.util.spec_from_file_location(name.replace('-', '_'), SCRIPTS / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,51 @@
+import pytest
+
+from customer_export import write_geojson, write_tiles
+
+
+def customer(i, lat=-26.1, lng=28.05):
+    return {"id": i, "lat": lat, "lng": lng, "tier": "Under R300", "style_id": "tier0",
+            "account": f"A{i}", "package": "Fibre", "monthly_fee": "R299", "fee": 299.0,
+            "precision": "rooftop"}
+
+
+def test_failed_geojson_leaves_no_temp_file(tmp_path):
+    def customers():
+        yield customer(1)
+        raise RuntimeError("index read failed")
+    with pytest.raises(RuntimeError):
+        write_geojson(tmp_path / "customers.geojson", customers())
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_tiles_refuse_to_replace_a_foreign_directory(tmp_path):
+    out = tmp_path / "docs"
+    out.mkdir()
+    (out / "README.md").write_text("keep me")
+    with pytest.raises(FileExistsError):
+        write_tiles(out, [customer(1)], max_zoom=6)
+    assert (out / "README.md").exists()
+    write_tiles(out, [customer(1)], max_zoom=6, force=True)
+    assert (out / "metadata.json").exists()
+
+
+def test_tiles_replace_a_previous_export(tmp_path):
+    out = tmp_path / "tiles"
+    write_tiles(out, [customer(1)], max_zoom=6)
+    write_tiles(out, [customer(1), customer(2, -33.9, 18.4)], max_zoom=6)
+    assert (out / "metadata.json").exists()
+
+
+def test_low_zooms_merge_nearby_customers(tmp_path, monkeypatch):
+    import customer_export
+    encoded = []
+    monkeypatch.setattr(customer_export, "encode_tile", lambda feats: encoded.extend(feats) or b"")
+    customers = [customer(i, -26.1 + i * 1e-5, 28.05) for i in range(50)] + [customer(99, -33.9, 18.4)]
+
+    write_tiles(tmp_path / "low", customers, min_zoom=4, max_zoom=4, detail_zoom=10)
+    assert sorted(f[3]["count"] for f in encoded) == [1, 50]
+
+    encoded.clear()
+    write_tiles(tmp_path / "detail", customers, min_zoom=10, max_zoom=10, detail_zoom=10)
+    assert len(encoded) == 51
+    assert all("count" not in f[3] and "account" in f[3] for f in encoded)
@@ -0,0 +1,37 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import deal_snapshot
+from deal_snapshot import is_fresh, load_deals, snapshot_path, write_snapshot
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "deals.json"
+    path.write_text(json.dumps([{"Deal ID": "D1", "Price": 199}, {"Deal ID": "D2", "Price": ""}]))
+    return path
+
+
+def test_touched_source_is_hashed_once(source, monkeypatch):
+    write_snapshot(source)
+    st = source.stat()
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    hashed = []
+    real = deal_snapshot.file_sha256
+    monkeypatch.setattr(deal_snapshot, "file_sha256", lambda path: hashed.append(path) or real(path))
+
+    assert is_fresh(source, snapshot_path(source))
+    assert is_fresh(source, snapshot_path(source))
+    assert len(hashed) == 1
+    assert list(load_deals(source)) == [{"Deal ID": "D1", "Price": 199}, {"Deal ID": "D2", "Price": ""}]
+    assert sorted(p.name for p in source.parent.iterdir()) == ["deals.json", "deals.json.arrow"]
+
+
+def test_changed_source_is_stale(source):
+    write_snapshot(source)
+    source.write_text(source.read_text().replace("D1", "D9"))
+    assert not is_fresh(source, snapshot_path(source))
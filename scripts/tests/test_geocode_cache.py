@@ -0,0 +1,51 @@
+import pytest
+
+import geocode_to_kml
+from geocode_cache import GeocodeCache
+
+ADDRESS = "12 Main Road, Sandton"
+KEY = geocode_to_kml.normalize_address(ADDRESS)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return GeocodeCache(tmp_path / "cache.sqlite")
+
+
+def respond(monkeypatch, response):
+    def fake_request(query):
+        if isinstance(response, Exception):
+            raise response
+        return response
+    monkeypatch.setattr(geocode_to_kml, "_request", fake_request)
+
+
+def test_ok_is_cached_with_precision(monkeypatch, cache):
+    respond(monkeypatch, {"status": "OK", "results": [{"geometry": {
+        "location": {"lat": -26.1, "lng": 28.05}, "location_type": "ROOFTOP"}}]})
+    assert geocode_to_kml.geocode(ADDRESS, cache) == (-26.1, 28.05)
+    assert cache.lookup(KEY) == (True, (-26.1, 28.05), "rooftop")
+
+
+def test_zero_results_is_cached_as_a_miss(monkeypatch, cache):
+    respond(monkeypatch, {"status": "ZERO_RESULTS", "results": []})
+    assert geocode_to_kml.geocode(ADDRESS, cache) is None
+    assert cache.lookup(KEY) == (True, None, None)
+
+
+@pytest.mark.parametrize("status", ["OVER_QUERY_LIMIT", "REQUEST_DENIED", "INVALID_REQUEST", "UNKNOWN_ERROR"])
+def test_transient_statuses_are_not_cached(monkeypatch, cache, status):
+    respond(monkeypatch, {"status": status})
+    assert geocode_to_kml.geocode(ADDRESS, cache) is None
+    assert KEY not in cache
+
+
+def test_transport_error_is_not_cached(monkeypatch, cache):
+    respond(monkeypatch, OSError("connection reset"))
+    assert geocode_to_kml.geocode(ADDRESS, cache) is None
+    assert KEY not in cache
+
+
+def test_zero_results_expires_after_negative_ttl(cache):
+    cache.put(KEY, None, "ZERO_RESULTS", fetched_at=0.0)
+    assert KEY not in cache
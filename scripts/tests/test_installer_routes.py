@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from installer_routes import assign, cluster
+
+
+def greedy(dist, capacity):
+    """Reference: points in regret order, each on its nearest centre with room."""
+    n, k = dist.shape
+    pref = np.argsort(dist, axis=1)
+    best2 = np.take_along_axis(dist, pref[:, :2], axis=1)
+    load = np.zeros(k, dtype=np.int64)
+    labels = np.empty(n, dtype=np.int64)
+    for i in np.argsort(-(best2[:, 1] - best2[:, 0]), kind="stable"):
+        c = next(c for c in pref[i] if load[c] < capacity)
+        labels[i] = c
+        load[c] += 1
+    return labels
+
+
+@pytest.mark.parametrize("n,k,slack", [(10, 3, 0), (500, 7, 0), (500, 7, 5), (300, 299, 0), (2000, 40, 0)])
+def test_assign_matches_greedy(n, k, slack):
+    dist = np.random.default_rng(n + k).random((n, k))
+    capacity = -(-n // k) + slack
+    labels = assign(dist, capacity)
+    assert np.bincount(labels, minlength=k).max() <= capacity
+    assert (labels == greedy(dist, capacity)).all()
+
+
+def test_cluster_without_iterations_still_labels():
+    rng = np.random.default_rng(0)
+    lat, lng = rng.uniform(-34, -25, 50), rng.uniform(18, 31, 50)
+    labels, centres, iterations = cluster(lat, lng, 5, capacity=10, max_iter=0)
+    assert iterations == 0
+    assert np.bincount(labels, minlength=5).max() <= 10
+
+
+def test_capacitated_run_converges_before_max_iter():
+    rng = np.random.default_rng(1)
+    towns = rng.choice(10, 2000)
+    lat = rng.uniform(-34, -25, 10)[towns] + rng.normal(0, 0.2, 2000)
+    lng = rng.uniform(18, 31, 10)[towns] + rng.normal(0, 0.2, 2000)
+    labels, centres, iterations = cluster(lat, lng, 80, capacity=25, max_iter=50)
+    assert iterations < 50
+    assert np.bincount(labels, minlength=80).max() <= 25
@@ -0,0 +1,30 @@
+import zipfile
+
+import pytest
+
+from kml_lod import build_quadtree, write_lod
+
+
+def point(lat, lng):
+    return (lat, lng, "Under R300", "tier0", "<Placemark/>")
+
+
+def depth(node):
+    return 0 if node.is_leaf else 1 + max(depth(c) for c in node.children)
+
+
+def test_stacked_points_stop_splitting():
+    points = [point(-26.1, 28.0)] * 600 + [point(-26.2, 28.1)] * 10
+    root = build_quadtree(points, leaf_size=250)
+    assert depth(root) == 1
+    assert sorted(len(c.points) for c in root.children) == [10, 600]
+
+
+def test_failed_kmz_leaves_no_temp_file(tmp_path, monkeypatch):
+    def broken(self, *args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(zipfile.ZipFile, "write", broken)
+    out = tmp_path / "map.kmz"
+    with pytest.raises(OSError):
+        write_lod(out, [point(-26.1, 28.0), point(-33.9, 18.4)], {"tier0": "ff00aa00"}, ["Under R300"], kmz=True)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,21 @@
+import pytest
+
+from postcode_gazetteer import split_address
+
+
+@pytest.mark.parametrize("address,code", [
+    ("12 Main Rd, Sandton, 2196", "2196"),
+    ("12 Main Rd, Sandton 2196", "2196"),
+    ("Unit 4, 2196, Sandton", "2196"),
+    ("1234 Main Rd, Sandton", None),
+    ("1234 Main Rd", None),
+    ("1234 Main Rd, Sandton, 2196", "2196"),
+    ("12a Main Rd 2196", None),
+    ("", None),
+])
+def test_postal_code(address, code):
+    assert split_address(address)[1] == code
+
+
+def test_parts_are_folded():
+    assert split_address(" 12  Main Rd , SANDTON.,, 2196")[0] == ["12 main rd", "sandton", "2196"]
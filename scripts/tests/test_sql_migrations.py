@@ -0,0 +1,116 @@
+import pytest
+
+import sql_migrations
+from sql_migrations import Migration, MigrationError, apply_migrations, checksum, split_sql
+
+
+def statements(sql):
+    return [s.sql for s in split_sql(sql)]
+
+
+def test_splits_on_top_level_semicolons():
+    assert statements("SELECT 1;\nSELECT 2;\n\nSELECT 3") == ["SELECT 1;", "SELECT 2;", "SELECT 3"]
+
+
+def test_dollar_quoted_bodies_keep_their_semicolons():
+    body = ("CREATE FUNCTION f() RETURNS int AS $fn$\nBEGIN\n  PERFORM 1;\n  RETURN $$;$$;\nEND;\n$fn$ "
+            "LANGUAGE plpgsql;")
+    assert statements(body + "\nSELECT 1;") == [body, "SELECT 1;"]
+
+
+def test_escape_strings():
+    sql = r"SELECT E'it\'s; fine', 'a''b;c';"
+    assert statements(sql + " SELECT 2;") == [sql, "SELECT 2;"]
+
+
+def test_nested_comments_are_skipped():
+    sql = "/* outer /* inner; */ still; comment */ SELECT 1;"
+    assert statements(sql + "\n-- only a comment;\n") == [sql]
+
+
+def test_begin_atomic_with_case():
+    sql = ("CREATE FUNCTION g(x int) RETURNS int LANGUAGE sql BEGIN ATOMIC\n"
+           "  SELECT CASE WHEN x > 0 THEN 1 ELSE 0 END;\n  SELECT 2;\nEND;")
+    assert statements(sql + "\nSELECT 3;") == [sql, "SELECT 3;"]
+
+
+def test_statement_line_numbers():
+    assert [s.line for s in split_sql("SELECT 1;\n\n-- note\nSELECT 2;\nSELECT\n3;")] == [1, 3, 5]
+
+
+def test_unterminated_quote_is_an_error():
+    with pytest.raises(MigrationError, match="line 2"):
+        split_sql("SELECT 1;\nSELECT $x$ never closed;")
+
+
+def write(tmp_path, name, sql):
+    path = tmp_path / name
+    path.write_text(sql, encoding="utf-8")
+    return path
+
+
+def test_begin_commit_dropped_rollback_refused(tmp_path):
+    m = Migration(write(tmp_path, "a.sql", "BEGIN;\nCREATE TABLE t (id int);\nCOMMIT;"))
+    assert [s.sql for s in m.statements] == ["CREATE TABLE t (id int);"]
+    assert len(m.dropped) == 2
+    with pytest.raises(MigrationError, match="ROLLBACK"):
+        Migration(write(tmp_path, "b.sql", "BEGIN;\nCREATE TABLE t (id int);\nROLLBACK;"))
+
+
+def test_concurrently_refused(tmp_path):
+    with pytest.raises(MigrationError, match="inside a transaction"):
+        Migration(write(tmp_path, "c.sql", "CREATE INDEX CONCURRENTLY i ON t (id);"))
+
+
+class FakeDb:
+    def __init__(self, recorded):
+        self.recorded = recorded
+        self.ran = []
+
+    def applied(self):
+        return dict(self.recorded)
+
+    def apply(self, migration, reapply=False, execute=True):
+        self.ran.append(migration.name)
+        self.recorded[migration.name] = migration.checksum
+        return True
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDb({})
+    monkeypatch.setattr(sql_migrations, "connect", lambda url: fake)
+    return fake
+
+
+def test_unchanged_file_is_a_no_op(tmp_path, db):
+    sql = "CREATE TABLE t (id int);"
+    db.recorded["t.sql"] = checksum(sql)
+    assert apply_migrations("postgres://", [write(tmp_path, "t.sql", sql)]) == ([], ["t.sql"])
+    assert db.ran == []
+
+
+def test_changed_file_is_refused_unless_reapplied(tmp_path, db):
+    db.recorded["t.sql"] = checksum("CREATE TABLE t (id int);")
+    path = write(tmp_path, "t.sql", "CREATE TABLE t (id bigint);")
+    with pytest.raises(MigrationError, match="changed since it was applied"):
+        apply_migrations("postgres://", [path])
+    assert db.ran == []
+    assert apply_migrations("postgres://", [path], reapply=True) == (["t.sql"], [])
+
+
+def test_psql_meta_commands_stand_alone():
+    sql = "-- dump\n\\restrict abc123\n\nSET x = 1;\nSELECT '\n\\not a command';\n"
+    assert [(s.line, s.sql) for s in split_sql(sql)] == [
+        (2, "\\restrict abc123"), (4, "SET x = 1;"), (5, "SELECT '\n\\not a command';")]
+
+
+def test_pg_dump_restrict_lines_dropped_other_meta_commands_refused(tmp_path):
+    m = Migration(write(tmp_path, "dump.sql", "\\restrict abc\nCREATE TABLE t (id int);\n\\unrestrict abc\n"))
+    assert [s.sql for s in m.statements] == ["CREATE TABLE t (id int);"]
+    assert len(m.dropped) == 2
+    with pytest.raises(MigrationError, match=r"line 2: psql meta-command \\i"):
+        Migration(write(tmp_path, "include.sql", "SELECT 1;\n\\i other.sql\n"))
@@ -0,0 +1,56 @@
+-- MTN business deals summary RPC
+--
+-- scripts/import-mtn-deals.py used to verify an import with nine round trips
+-- (a total count, one count per contract term, then a sample). This function
+-- returns everything in one call, computed in a single scan of the table via
+-- GROUPING SETS: totals by contract term, price plan and device, monthly price
+-- min/max/avg, and a handful of sample deals.
+
+CREATE OR REPLACE FUNCTION public.mtn_business_deals_summary()
+RETURNS jsonb
+  LANGUAGE sql STABLE
+  SET search_path TO 'public'
+AS $$
+  WITH grouped AS (
+    SELECT
+      GROUPING(contract_term, price_plan, device_name) AS level,
+      contract_term,
+      price_plan,
+      COALESCE(device_name, '(none)') AS device_name,
+      COUNT(*) AS deals,
+      COUNT(*) FILTER (WHERE active) AS active,
+      MIN(monthly_price_incl_vat) AS price_min,
+      MAX(monthly_price_incl_vat) AS price_max,
+      ROUND(AVG(monthly_price_incl_vat), 2) AS price_avg
+    FROM public.mtn_business_deals
+    GROUP BY GROUPING SETS ((), (contract_term), (price_plan), (device_name))
+  )
+  SELECT jsonb_build_object(
+    'total',  COALESCE((SELECT deals FROM grouped WHERE level = 7), 0),
+    'active', COALESCE((SELECT active FROM grouped WHERE level = 7), 0),
+    'price', (
+      SELECT jsonb_build_object('min', price_min, 'max', price_max, 'avg', price_avg)
+      FROM grouped WHERE level = 7
+    ),
+    -- level is a bitmask of the columns rolled up: 3 = only contract_term kept,
+    -- 5 = only price_plan, 6 = only device_name.
+    'by_term', COALESCE(
+      (SELECT jsonb_object_agg(contract_term::text, deals) FROM grouped WHERE level = 3), '{}'::jsonb),
+    'by_price_plan', COALESCE(
+      (SELECT jsonb_object_agg(price_plan, deals) FROM grouped WHERE level = 5), '{}'::jsonb),
+    'by_device', COALESCE(
+      (SELECT jsonb_object_agg(device_name, deals) FROM grouped WHERE level = 6), '{}'::jsonb),
+    'sample', COALESCE((
+      SELECT jsonb_agg(jsonb_build_object(
+        'deal_name', s.deal_name,
+        'monthly_price_incl_vat', s.monthly_price_incl_vat))
+      FROM (SELECT deal_name, monthly_price_incl_vat FROM public.mtn_business_deals LIMIT 5) s
+    ), '[]'::jsonb)
+  );
+$$;
+
+REVOKE ALL ON FUNCTION public.mtn_business_deals_summary() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.mtn_business_deals_summary() TO service_role;
+
+COMMENT ON FUNCTION public.mtn_business_deals_summary() IS
+  'One-call aggregate over mtn_business_deals (totals by term / price plan / device, price min/max/avg, sample). Used by scripts/import-mtn-deals.py --verify-only.';
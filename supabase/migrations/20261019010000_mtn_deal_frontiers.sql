@@ -0,0 +1,40 @@
+-- MTN deal frontiers: cheapest-deal lookup per device and contract term
+--
+-- "What's the cheapest way to get device X on 24 months with at least N GB"
+-- used to mean scanning mtn_business_deals. scripts/import-mtn-deals.py now
+-- precomputes, for every device × contract term, the Pareto-optimal deals
+-- (no other deal is cheaper per month, cheaper once-off and offers at least
+-- as much data and minutes) and stores them here, cheapest first. Every such
+-- question is answered by the first frontier entry meeting the data /
+-- minutes floor, after a single primary-key read.
+
+CREATE TABLE IF NOT EXISTS public.mtn_deal_frontiers (
+  device_name TEXT NOT NULL,
+  contract_term INTEGER NOT NULL,
+  -- [{deal_id, price_plan, monthly, once_off, data_gb, minutes}, ...] by monthly price
+  deals JSONB NOT NULL DEFAULT '[]'::jsonb,
+  deal_count INTEGER NOT NULL DEFAULT 0,
+  source TEXT,
+  built_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (device_name, contract_term)
+);
+
+ALTER TABLE public.mtn_deal_frontiers ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow authenticated users to read deal frontiers" ON public.mtn_deal_frontiers;
+CREATE POLICY "Allow authenticated users to read deal frontiers"
+  ON public.mtn_deal_frontiers
+  FOR SELECT
+  TO authenticated
+  USING (true);
+
+DROP POLICY IF EXISTS "Service role has full access to deal frontiers" ON public.mtn_deal_frontiers;
+CREATE POLICY "Service role has full access to deal frontiers"
+  ON public.mtn_deal_frontiers
+  FOR ALL
+  TO service_role
+  USING (true)
+  WITH CHECK (true);
+
+COMMENT ON TABLE public.mtn_deal_frontiers IS
+  'Pareto-optimal MTN deals (monthly price, once-off pay-in, data, minutes) per device and contract term, rebuilt by scripts/import-mtn-deals.py.';